@@ -1,4 +1,5 @@
 # config.py - Token configuration for NEAR Intents Client
+from functools import lru_cache
 
 # Token data for a minimal set of tokens (NEAR and USDC)
 TOKENS = [
@@ -442,15 +443,31 @@ TOKENS = [
 }
 ]
 
+# Indexes over TOKENS built once at import, in TOKENS order
+TOKENS_BY_SYMBOL = {}
+SYMBOL_BY_ASSET_ID = {}
+for _token in TOKENS:
+    TOKENS_BY_SYMBOL.setdefault(_token["symbol"], []).append(_token)
+    for _chain_data in _token.get("chains", {}).values():
+        if "defuse_asset_id" in _chain_data:
+            SYMBOL_BY_ASSET_ID.setdefault(_chain_data["defuse_asset_id"], _token["symbol"])
+
 # Helper functions
+# Lookups over TOKENS are pure functions of their arguments, so they are
+# memoized - the token table is small and never mutated
+@lru_cache(maxsize=256)
 def get_token_by_symbol(symbol, chain=None):
     """Find a token by its symbol, optionally filtered by chain."""
-    for token in TOKENS:
-        if token["symbol"] == symbol:
-            if chain is None or chain in token.get("chains", {}):
-                return token
+    for token in TOKENS_BY_SYMBOL.get(symbol, ()):
+        if chain is None or chain in token.get("chains", {}):
+            return token
     return None
 
+def get_symbol_by_asset_id(asset_id):
+    """Find the symbol of a defuse asset ID (e.g. 'nep141:wrap.near')."""
+    return SYMBOL_BY_ASSET_ID.get(asset_id)
+
+@lru_cache(maxsize=256)
 def get_token_id(symbol, chain="near"):
     """Get the token_id for a specific token on a specific chain."""
     token = get_token_by_symbol(symbol, chain)
@@ -458,6 +475,7 @@ def get_token_id(symbol, chain="near"):
         return token["chains"][chain].get("token_id")
     return None
 
+@lru_cache(maxsize=256)
 def get_defuse_asset_id(symbol, chain="near"):
     """Get the defuse_asset_id for a specific token on a specific chain."""
     token = get_token_by_symbol(symbol, chain)
@@ -465,6 +483,7 @@ def get_defuse_asset_id(symbol, chain="near"):
         return token["chains"][chain].get("defuse_asset_id")
     return None
 
+@lru_cache(maxsize=256)
 def to_asset_id(symbol, chain="near"):
     """Convert a token symbol to an asset ID for use in intents."""
     defuse_asset_id = get_defuse_asset_id(symbol, chain)
@@ -480,18 +499,30 @@ def to_asset_id(symbol, chain="near"):
 #ensure decimal calculations are precise
 from decimal import Decimal
 
+# Precomputed powers of ten so conversions don't evaluate 10 ** decimals per call
+POW10 = [10 ** i for i in range(40)]
+
+# Decimals per symbol, first entry wins like get_token_by_symbol
+DECIMALS_BY_SYMBOL = {symbol: tokens[0]["decimals"] for symbol, tokens in TOKENS_BY_SYMBOL.items()}
+
+# Trading loops convert the same few amounts over and over; equal numbers
+# (1, 1.0, Decimal("1")) share a cache entry and convert to the same string
+@lru_cache(maxsize=1024)
 def to_decimals(amount, symbol, chain="near"):
     """Convert a human-readable amount to base units."""
-    token = get_token_by_symbol(symbol)
-    if token:
-        return str(int(Decimal(str(amount)) * Decimal(10) ** token["decimals"]))
-    return None
+    decimals = DECIMALS_BY_SYMBOL.get(symbol)
+    if decimals is None:
+        return None
+    if isinstance(amount, int):
+        return str(amount * POW10[decimals])
+    # Shift the decimal exponent rather than multiplying by a power of ten
+    return str(int(Decimal(str(amount)).scaleb(decimals)))
 
 def from_decimals(amount_str, symbol):
     """Convert from base units to human-readable amount."""
-    token = get_token_by_symbol(symbol)
-    if token:
-        return float(amount_str) / (10 ** token["decimals"])
+    decimals = DECIMALS_BY_SYMBOL.get(symbol)
+    if decimals is not None:
+        return float(amount_str) / POW10[decimals]
     return None
 
 def get_supported_tokens(chain=None):
@@ -509,6 +540,7 @@ def get_supported_chains():
                 chains.add(chain)
     return sorted(list(chains))
 
+@lru_cache(maxsize=256)
 def get_omft_address(symbol, chain="near"):
     """Get the OMFT address for cross-chain transfers if available."""
     token = get_token_by_symbol(symbol, chain)
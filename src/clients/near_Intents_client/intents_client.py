@@ -1,11 +1,22 @@
 from typing import TypedDict, List, Dict, Union
 import borsh_construct
+import atexit
 import os
 import json
+import functools
+import hashlib
+import random
 import base64
+import secrets
+import struct
 import base58
-import random
+import nacl.exceptions
+import nacl.signing
 import requests
+import aiohttp
+import asyncio
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import near_api
 from . import config
 from clients.near_Intents_client.config import (
@@ -20,11 +31,78 @@ from clients.near_Intents_client.config import (
 from dotenv import load_dotenv
 import time
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+try:
+    import orjson
+
+    def _dumpb(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+
+    def _dumps(obj):
+        return _dumpb(obj).decode('utf-8')
+
+    _loads = orjson.loads
+except ImportError:  # orjson is optional, fall back to the stdlib codec
+    def _dumps(obj):
+        return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+    def _dumpb(obj):
+        return _dumps(obj).encode('utf-8')
+
+    _loads = json.loads
+
+try:
+    import based58
+
+    def _b58encode(data):
+        return based58.b58encode(data).decode('ascii')
+
+    def _b58decode(text):
+        return based58.b58decode(text.encode('ascii'))
+except ImportError:  # based58 is optional, fall back to the pure-Python codec
+    def _b58encode(data):
+        return base58.b58encode(data).decode('ascii')
+
+    _b58decode = base58.b58decode
 
 load_dotenv()
 
+# Default credentials for create_account, read once after .env is loaded
+NEAR_ACCOUNT_ID = os.getenv('NEAR_ACCOUNT_ID')
+NEAR_PRIVATE_KEY = os.getenv('NEAR_PRIVATE_KEY')
+NEAR_RPC_URL = os.getenv('NEAR_RPC_URL', 'https://rpc.mainnet.near.org')
+
 MAX_GAS = 300 * 10 ** 12
+WRAP_GAS = 10 * 10 ** 12  # near_deposit only mints wNEAR, no cross-contract calls
+STORAGE_DEPOSIT = 1250000000000000000000  # 0.00125 NEAR in yoctoNEAR
 SOLVER_BUS_URL = os.getenv('SOLVER_BUS_URL', "https://solver-relay-v2.chaindefuser.com/rpc")
+MAX_BATCH = 20  # Quotes per JSON-RPC batch sent to the solver bus
+# Some relays throttle or reject array bodies, INTENTS_SOLVER_BATCHING=0 sends one POST per quote instead
+SOLVER_BUS_BATCHING = os.getenv('INTENTS_SOLVER_BATCHING', '1').lower() not in ('0', 'false')
+MAX_CONCURRENT_CALLS = 16  # In-flight RPC calls per async fan-out
+SOLVER_BUS_TIMEOUT = (3.05, 10)  # (connect, read) seconds, connect just past the 3s TCP retransmit window
+NEAR_RPC_TIMEOUT = (3.05, 15)  # (connect, read) seconds for NEAR RPC view calls, kept separate from the solver bus
+# Merkle batch signing needs verifier-side support, keep it off unless explicitly enabled
+MERKLE_BATCH_SIGNING = os.getenv('INTENTS_MERKLE_SIGNING', '').lower() in ('1', 'true')
+
+def _json_session(max_retries):
+    """Create a pooled keep-alive session for JSON-RPC POSTs"""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=max_retries))
+    # Bodies are posted pre-encoded with _dumpb (data=...), so the JSON content type is set here once
+    session.headers.update({"Connection": "keep-alive", "Content-Type": "application/json"})
+    return session
+
+
+# Shared HTTP session so solver bus quotes and RPC view calls reuse pooled keep-alive connections.
+# Those POSTs are read-only, so they are retried on gateway errors (urllib3 skips POST by default)
+SESSION = _json_session(Retry(
+    total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504], allowed_methods=frozenset({"POST"})
+))
+# publish_intent is not idempotent, a retried POST could publish the same intent twice
+PUBLISH_SESSION = _json_session(0)
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -42,18 +120,56 @@ class Quote(TypedDict):
     intents: List[Intent]
 
 
+# Built once at import, constructing the schema is far more work than encoding with it
+_INTENT_SCHEMA = borsh_construct.CStruct(
+    'intent' / borsh_construct.String,
+    'diff' / borsh_construct.HashMap(borsh_construct.String, borsh_construct.String)
+)
+_QUOTE_SCHEMA = borsh_construct.CStruct(
+    'nonce' / borsh_construct.String,
+    'signer_id' / borsh_construct.String,
+    'verifying_contract' / borsh_construct.String,
+    'deadline' / borsh_construct.String,
+    'intents' / borsh_construct.Vec(_INTENT_SCHEMA)
+)
+
+
+def _borsh_string(value):
+    data = value.encode('utf-8')
+    return struct.pack('<I', len(data)) + data
+
+
+def _encode_diff_pair(key1, value1, key2, value2):
+    """Borsh-encode a two-entry diff map, entries in key order like HashMap"""
+    if key2 < key1:
+        key1, value1, key2, value2 = key2, value2, key1, value1
+    return b''.join((
+        struct.pack('<I', 2),
+        _borsh_string(key1), _borsh_string(value1),
+        _borsh_string(key2), _borsh_string(value2)
+    ))
+
+
 def quote_to_borsh(quote):
-    QuoteSchema = borsh_construct.CStruct(
-        'nonce' / borsh_construct.String,
-        'signer_id' / borsh_construct.String,
-        'verifying_contract' / borsh_construct.String,
-        'deadline' / borsh_construct.String,
-        'intents' / borsh_construct.Vec(borsh_construct.CStruct(
-            'intent' / borsh_construct.String,
-            'diff' / borsh_construct.HashMap(borsh_construct.String, borsh_construct.String)
-        ))
-    )
-    return QuoteSchema.build(quote)
+    # Token diffs nearly always swap exactly two assets, encode those directly
+    intents = quote["intents"]
+    if not all(len(intent["diff"]) == 2 for intent in intents):
+        return _QUOTE_SCHEMA.build(quote)
+    parts = [
+        _borsh_string(quote["nonce"]),
+        _borsh_string(quote["signer_id"]),
+        _borsh_string(quote["verifying_contract"]),
+        _borsh_string(quote["deadline"]),
+        struct.pack('<I', len(intents))
+    ]
+    for intent in intents:
+        parts.append(_borsh_string(intent["intent"]))
+        parts.append(_encode_diff_pair(*(item for entry in intent["diff"].items() for item in entry)))
+    return b''.join(parts)
+
+
+def quote_to_borsh_many(quotes):
+    return [quote_to_borsh(quote) for quote in quotes]
 
 
 class AcceptQuote(TypedDict):
@@ -82,7 +198,50 @@ def get_asset_id(token):
     return config.to_asset_id(token)
 
 
-def register_token_storage(account, token, destination_address=None, other_account=None):
+def _backoff_delays(budget, first=0.3, factor=1.6, cap=3.0):
+    """Growing poll delays, capped at cap seconds each, adding up to budget seconds"""
+    delays, total, delay = [], 0.0, first
+    while total < budget:
+        delays.append(min(delay, budget - total))
+        total += delays[-1]
+        delay = min(delay * factor, cap)
+    return tuple(delays)
+
+
+# Back-off between polls of on-chain state, 8 seconds in total unless INTENTS_POLL_TIMEOUT says otherwise
+POLL_DELAYS = _backoff_delays(float(os.getenv('INTENTS_POLL_TIMEOUT', '8')))
+# Each delay is stretched or shrunk by up to this fraction so concurrent pollers don't hit the RPC in lockstep
+POLL_JITTER = 0.2
+
+
+def _poll_until(check, delays=POLL_DELAYS, retry_on=None):
+    """
+    Poll check() with increasing, jittered delays until it returns a truthy value
+    Returns that value, or the last falsy one once the delays run out
+    Exceptions from check() count as a miss, unless retry_on(exception) is
+    given and returns False, in which case the exception is re-raised
+    """
+    result = None
+    for delay in delays:
+        time.sleep(delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER))
+        try:
+            result = check()
+        except Exception as e:
+            if retry_on is not None and not retry_on(e):
+                raise
+            logger.debug("Poll check failed: %s", e)
+            continue
+        if result:
+            return result
+    return result
+
+
+# (contract_id, account_id) storage registrations and (account_id, public_key)
+# intents keys confirmed in this process, neither is ever undone by this client
+_REGISTERED = set()
+
+
+def register_token_storage(account, token, destination_address=None, other_account=None, force=False):
     """
     Register storage for a token contract
     
@@ -91,6 +250,9 @@ def register_token_storage(account, token, destination_address=None, other_accou
         token: Token symbol (e.g., 'USDC', 'NEAR')
         destination_address: Address to register (defaults to account.account_id)
         other_account: Another account to register (optional)
+        force: Send storage_deposit without checking storage_balance_of first.
+            Token contracts refund the deposit for accounts that are already
+            registered, so this saves the view round-trips at the cost of the tx gas
     
     Returns:
         bool: True if registration was successful or already registered
@@ -102,90 +264,352 @@ def register_token_storage(account, token, destination_address=None, other_accou
     token_id = config.get_token_id(token, "near")
     
     if not token_id:
-        logger.error(f"Token {token} not supported on NEAR chain")
+        logger.error("Token %s not supported on NEAR chain", token)
         return False
     
-    # Register the main account
-    success = _register_single_account(account, token_id, destination_address)
+    accounts = [destination_address, other_account] if other_account else [destination_address]
+    # Registrations confirmed earlier in this process stay in place, skip their checks
+    accounts = [account_id for account_id in accounts if (token_id, account_id) not in _REGISTERED]
+    if not accounts:
+        return True
     
-    # Register the other account if provided
-    if other_account and success:
-        other_success = _register_single_account(account, token_id, other_account)
-        return success and other_success
-        
-    return success
-
-
-def _register_single_account(account, token_id, account_to_register):
-    """Helper function to register a single account with a token contract"""
-    logger.info(f"Checking if {account_to_register} is registered with token contract {token_id}...")
+    if force:
+        missing = accounts
+    else:
+        # Check every account's storage at once, then only register the missing ones
+        storage_balances = view_calls(account, [
+            (token_id, 'storage_balance_of', {'account_id': account_id}) for account_id in accounts
+        ])
+        missing = [
+            account_id for account_id, storage_balance in zip(accounts, storage_balances)
+            if not storage_balance or isinstance(storage_balance, Exception)
+        ]
+        _REGISTERED.update((token_id, account_id) for account_id in accounts if account_id not in missing)
+    if not missing:
+        logger.info("%s already registered with token contract %s", ', '.join(accounts), token_id)
+        return True
     
+    # Broadcast every storage deposit before waiting, so they land in the same blocks
+    logger.info("Registering %s with token contract %s...", ', '.join(missing), token_id)
     try:
-        # Check if already registered
-        storage_balance = account.view_function(
-            token_id,
-            'storage_balance_of',
-            {'account_id': account_to_register}
-        )
-        
-        logger.info(f"Storage balance check result: {storage_balance}")
-        
-        if storage_balance and 'result' in storage_balance and storage_balance['result']:
-            logger.info(f"Account {account_to_register} already registered with token contract")
-            return True
-            
-        # Not registered, need to register
-        logger.info(f"Account {account_to_register} not registered with token contract. Registering...")
-        
-        # Use the exact yoctoNEAR amount as an integer (not a string)
-        try:
-            # The key fix: Use an integer for amount, not a string
-            deposit_amount = 1250000000000000000000  # 0.00125 NEAR in yoctoNEAR
-            
-            result = account.function_call(
-                token_id,
-                'storage_deposit',
-                {'account_id': account_to_register},
-                gas=MAX_GAS,
-                amount=deposit_amount  # Integer, not string
-            )
-            
-            logger.info(f"Registration result: {result}")
-        except Exception as reg_error:
-            logger.error(f"Error during registration function call: {str(reg_error)}")
-            return False
-        
-        # Verify registration was successful
-        time.sleep(5)  # Wait for transaction to complete
-        try:
-            storage_balance = account.view_function(
-                token_id,
-                'storage_balance_of',
-                {'account_id': account_to_register}
-            )
-            
-            logger.info(f"Storage balance check after registration: {storage_balance}")
-            
-            if storage_balance and 'result' in storage_balance and storage_balance['result']:
-                logger.info(f"Successfully registered {account_to_register} with token contract")
-                return True
-            else:
-                logger.error(f"Failed to register {account_to_register} with token contract")
-                return False
-        except Exception as check_error:
-            logger.error(f"Error checking registration status: {str(check_error)}")
-            return False
-            
+        tx_hashes = [
+            function_call_async(account, token_id, 'storage_deposit', _storage_deposit_args(account_id), MAX_GAS, STORAGE_DEPOSIT)
+            for account_id in missing
+        ]
     except Exception as e:
-        logger.error(f"Error in registration process: {str(e)}")
+        logger.error("Error during registration function call: %s", e)
+        return False
+    
+    if not all([wait_for_tx(account, tx_hash) for tx_hash in tx_hashes]):
+        return False
+    if force:
+        # A successful storage_deposit leaves the account registered either way
+        _REGISTERED.update((token_id, account_id) for account_id in missing)
+        return True
+    
+    storage_balances = view_calls(account, [
+        (token_id, 'storage_balance_of', {'account_id': account_id}) for account_id in missing
+    ])
+    for account_id, storage_balance in zip(missing, storage_balances):
+        if not storage_balance or isinstance(storage_balance, Exception):
+            logger.error("Failed to register %s with token contract", account_id)
+            return False
+        _REGISTERED.add((token_id, account_id))
+        logger.info("Successfully registered %s with token contract", account_id)
+    return True
+
+
+@functools.lru_cache(maxsize=64)
+def _storage_deposit_args(account_id):
+    """Serialized storage_deposit args, the same few accounts get registered over and over"""
+    return _dumpb({'account_id': account_id})
+
+
+def function_call_async(account, contract_id, method_name, args, gas=MAX_GAS, amount=0):
+    """
+    Sign and broadcast a function call without waiting for it to execute
+    Several calls can be in flight at once and awaited with wait_for_tx
+    Args:
+        args: Call arguments, as a dict or already serialized JSON bytes
+    Returns:
+        str: The transaction hash
+    """
+    action = near_api.transactions.create_function_call_action(
+        method_name, args if isinstance(args, bytes) else _dumpb(args), gas, amount
+    )
+    return account.provider.send_tx(_sign_actions(account, contract_id, [action]))
+
+
+def _sign_actions(account, receiver_id, actions):
+    """Sign and serialize a transaction of one or more actions with the account's next nonce"""
+    account.access_key["nonce"] += 1
+    block_hash = _b58decode(account.provider.get_status()['sync_info']['latest_block_hash'])
+    return near_api.transactions.sign_and_serialize_transaction(
+        receiver_id, account.access_key["nonce"], actions, block_hash, account.signer
+    )
+
+
+def submit_actions(account, receiver_id, actions, timeout=10):
+    """
+    Send a multi-action transaction and wait for it to execute
+    near_api's Account only has single-action function_call, this does the
+    same through the public transactions/provider API (near-api-py 0.1.x)
+    Returns:
+        dict: The final execution outcome
+    Raises:
+        near_api.account.TransactionError: If the transaction failed
+    """
+    result = account.provider.send_tx_and_wait(_sign_actions(account, receiver_id, actions), timeout)
+    if 'Failure' in result['status']:
+        raise near_api.account.TransactionError(result['status']['Failure'])
+    return result
+
+
+# NEAR RPC error names that only mean "not yet", e.g. a freshly broadcast tx the node hasn't seen
+_TRANSIENT_RPC_ERRORS = frozenset({"UNKNOWN_TRANSACTION", "TIMEOUT_ERROR"})
+
+
+def _is_transient_rpc_error(e):
+    """Check whether an RPC failure is worth retrying rather than a hard error"""
+    if isinstance(e, (requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(e, requests.HTTPError):
+        status = e.response.status_code if e.response is not None else 0
+        return status >= 500 or status in (408, 429)
+    if isinstance(e, near_api.providers.JsonProviderError) and e.args and isinstance(e.args[0], dict):
+        error = e.args[0]
+        cause = error.get("cause") or {}
+        return error.get("name") in _TRANSIENT_RPC_ERRORS or cause.get("name") in _TRANSIENT_RPC_ERRORS
+    return False
+
+
+def wait_for_tx(account, tx_hash, delays=POLL_DELAYS):
+    """
+    Poll a broadcast transaction until it has executed
+    Returns:
+        bool: True if it succeeded, False if it failed or did not land in time
+    Raises:
+        Exception: Hard RPC errors (bad hash, HTTP 4xx, ...) instead of polling on
+    """
+    # get_tx errors with UNKNOWN_TRANSACTION until the node knows the tx, only retry that kind
+    result = _poll_until(
+        lambda: account.provider.get_tx(tx_hash, account.account_id), delays, retry_on=_is_transient_rpc_error
+    )
+    if not result:
+        logger.error("Transaction %s not executed in time", tx_hash)
         return False
+    if 'Failure' in result['status']:
+        logger.error("Transaction %s failed: %s", tx_hash, result['status']['Failure'])
+        return False
+    return True
+
+
+def _fresh_nonce():
+    """Generate a random 32-byte intent nonce from the CSPRNG, base64 encoded"""
+    return base64.b64encode(secrets.token_bytes(32)).decode('ascii')
+
+
+def _public_key_str(signer):
+    """Get the 'ed25519:<base58>' public key of a signer, encoding it only once"""
+    public_key = getattr(signer, '_cached_pub_b58', None)
+    if public_key is None:
+        public_key = 'ed25519:' + _b58encode(signer.public_key)
+        signer._cached_pub_b58 = public_key
+    return public_key
+
+
+def _sign_bytes(signer, data):
+    """
+    Sign bytes with the signer's ed25519 key through libsodium
+    near_api signs with the pure-Python ed25519 package, PyNaCl produces the
+    same deterministic signature about 20x faster. The SigningKey is built
+    once from the key pair's seed and cached on the signer
+    """
+    signing_key = getattr(signer, '_cached_nacl_key', None)
+    if signing_key is None:
+        try:
+            signing_key = nacl.signing.SigningKey(signer.key_pair._secret_key.to_seed())
+        except AttributeError:  # Not a near_api key pair, sign through it
+            return signer.sign(data)
+        signer._cached_nacl_key = signing_key
+    return signing_key.sign(data).signature
 
 
 def sign_quote(account, quote):
-    quote_data = quote.encode('utf-8')
-    signature = 'ed25519:' + base58.b58encode(account.signer.sign(quote_data)).decode('utf-8')
-    public_key = 'ed25519:' + base58.b58encode(account.signer.public_key).decode('utf-8')
-    return Commitment(standard="raw_ed25519", payload=quote, signature=signature, public_key=public_key)
+    """
+    Sign a JSON quote with the raw_ed25519 standard
+    The intents contract verifies the signature against the exact payload
+    string it receives, so the JSON text itself is signed (not its borsh form)
+    The quote may be given as UTF-8 bytes (e.g. from _dumpb) to skip re-encoding
+    """
+    if isinstance(quote, bytes):
+        quote_data, quote = quote, quote.decode('utf-8')
+    else:
+        quote_data = quote.encode('utf-8')
+    signature = 'ed25519:' + _b58encode(_sign_bytes(account.signer, quote_data))
+    public_key = _public_key_str(account.signer)
+    commitment: Commitment = {
+        "standard": "raw_ed25519",
+        "payload": quote,
+        "signature": signature,
+        "public_key": public_key
+    }
+    return commitment
+
+
+def _merkle_leaf(payload):
+    """Hash a leaf, the 0x00 prefix keeps a 64-byte payload from passing as an internal node"""
+    return hashlib.sha256(b'\x00' + payload).digest()
+
+
+def _merkle_node(left, right):
+    """Hash an internal node from its two children, prefixed 0x01"""
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def _merkle_levels(leaves):
+    """Build every level of a sha256 Merkle tree, from the leaf hashes up to the root"""
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        if len(level) % 2:
+            level = level + [level[-1]]  # duplicate the last node on odd levels
+        levels.append([
+            _merkle_node(level[i], level[i + 1])
+            for i in range(0, len(level), 2)
+        ])
+    return levels
+
+
+def _merkle_proof(levels, index):
+    """Collect the sibling hashes needed to rebuild the root from one leaf"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        sibling_hash = level[sibling] if sibling < len(level) else level[index]
+        proof.append({
+            "hash": _b58encode(sibling_hash),
+            "position": "left" if sibling < index else "right"
+        })
+        index //= 2
+    return proof
+
+
+def _merkle_root_from_proof(leaf, proof):
+    """Fold a leaf hash with its inclusion proof back up to the Merkle root"""
+    node = leaf
+    for step in proof:
+        sibling = _b58decode(step["hash"])
+        node = _merkle_node(sibling, node) if step["position"] == "left" else _merkle_node(node, sibling)
+    return node
+
+
+def _parallel_map(fn, items, workers=None):
+    """Map fn over items on a thread pool, PyNaCl releases the GIL while signing and verifying"""
+    if workers == 1 or len(items) < 2:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return list(executor.map(fn, items))
+
+
+def sign_quote_batch(account, quotes, workers=None):
+    """
+    Sign several JSON quotes at once
+
+    With MERKLE_BATCH_SIGNING enabled only the Merkle root of the quote hashes
+    is signed, and every commitment carries its inclusion proof. Otherwise each
+    quote is signed individually with sign_quote, spread across worker threads.
+
+    Args:
+        account: NEAR account
+        quotes: List of JSON quote strings
+        workers: Number of signing threads (defaults to the CPU count)
+
+    Returns:
+        list: One commitment per quote, in the same order
+    """
+    if not MERKLE_BATCH_SIGNING or len(quotes) < 2:
+        return _parallel_map(lambda quote: sign_quote(account, quote), quotes, workers)
+
+    levels = _merkle_levels([_merkle_leaf(quote.encode('utf-8')) for quote in quotes])
+    root = levels[-1][0]
+    signature = 'ed25519:' + _b58encode(_sign_bytes(account.signer, root))
+    public_key = _public_key_str(account.signer)
+    merkle_root = _b58encode(root)
+
+    return [
+        {
+            "standard": "merkle_ed25519",
+            "payload": quote,
+            "signature": signature,
+            "public_key": public_key,
+            "merkle_root": merkle_root,
+            "merkle_proof": _merkle_proof(levels, index)
+        }
+        for index, quote in enumerate(quotes)
+    ]
+
+
+def verify_quotes_batch(commitments, workers=None):
+    """
+    Verify the signatures of raw_ed25519 commitments (e.g. quotes signed by a counterparty),
+    and of merkle_ed25519 ones from sign_quote_batch by rebuilding their root from the proof
+
+    Verify keys are decoded once per distinct public key and reused across the batch,
+    and signatures are checked across worker threads.
+
+    Args:
+        commitments: List of commitments with payload, signature and public_key
+        workers: Number of verification threads (defaults to the CPU count)
+
+    Returns:
+        list: One bool per commitment, True when its signature is valid
+    """
+    verify_keys = {}
+
+    def verify(commitment):
+        try:
+            public_key, signature, payload = commitment["public_key"], commitment["signature"], commitment["payload"]
+            # An AcceptQuote dict payload or a missing key would otherwise raise AttributeError below
+            if not all(isinstance(value, str) for value in (public_key, signature, payload)):
+                raise TypeError("payload, signature and public_key must be strings")
+            verify_key = verify_keys.get(public_key)
+            if verify_key is None:
+                verify_key = nacl.signing.VerifyKey(_b58decode(public_key.split(':', 1)[-1]))
+                verify_keys[public_key] = verify_key
+            signature = _b58decode(signature.split(':', 1)[-1])
+            message = payload.encode('utf-8')
+            if commitment.get("standard") == "merkle_ed25519":
+                message = _merkle_root_from_proof(_merkle_leaf(message), commitment["merkle_proof"])
+                if message != _b58decode(commitment["merkle_root"]):
+                    raise ValueError("Merkle proof does not lead to merkle_root")
+            verify_key.verify(message, signature)
+            return True
+        except (KeyError, TypeError, ValueError, nacl.exceptions.CryptoError) as e:
+            logger.warning("Invalid commitment signature: %s", e)
+            return False
+
+    return _parallel_map(verify, commitments, workers)
+
+
+# Static part of every quote, copied and filled in per intent
+_QUOTE_TEMPLATE = {
+    "signer_id": None,
+    "nonce": None,
+    "verifying_contract": "intents.near",
+    "deadline": None,
+    "intents": None
+}
+
+
+def _build_quote(account, intents) -> Quote:
+    """Fill a copy of the quote template with a fresh nonce and deadline"""
+    quote = _QUOTE_TEMPLATE.copy()
+    quote["signer_id"] = account.account_id
+    quote["nonce"] = _fresh_nonce()
+    quote["deadline"] = get_future_deadline()
+    quote["intents"] = intents
+    return quote
 
 
 def create_token_diff_quote(account, token_in, amount_in, token_out, amount_out, quote_asset_in=None, quote_asset_out=None):
@@ -197,20 +621,14 @@ def create_token_diff_quote(account, token_in, amount_in, token_out, amount_out,
     if not token_in_fmt or not token_out_fmt:
         raise ValueError(f"Token {token_in} or {token_out} not supported")
         
-    nonce = base64.b64encode(random.getrandbits(256).to_bytes(32, byteorder='big')).decode('utf-8')
-    quote = json.dumps(Quote(
-        signer_id=account.account_id,
-        nonce=nonce,
-        verifying_contract="intents.near",
-        deadline=get_future_deadline(),
-        intents=[
-            Intent(intent='token_diff', diff={
-                token_in_fmt: f"-{str(amount_in)}",
-                token_out_fmt: str(amount_out)
-            })
-        ]
-    ))
-    return sign_quote(account, quote)
+    quote = _build_quote(account, [{
+        "intent": "token_diff",
+        "diff": {
+            token_in_fmt: f"-{amount_in}",
+            token_out_fmt: f"{amount_out}"
+        }
+    }])
+    return sign_quote(account, _dumpb(quote))
 
 
 def submit_signed_intent(account, signed_intent):
@@ -238,7 +656,7 @@ def wrap_near(account, amount):
             int(amount_base)
         )
     except Exception as e:
-        logger.error(f"Error wrapping NEAR: {str(e)}")
+        logger.error("Error wrapping NEAR: %s", e)
         raise e
 
 
@@ -263,7 +681,7 @@ def unwrap_near(account, amount):
             1  # Attach exactly 1 yoctoNEAR as required by the contract
         )
     except Exception as e:
-        logger.error(f"Error unwrapping NEAR: {str(e)}")
+        logger.error("Error unwrapping NEAR: %s", e)
         raise e
 
 
@@ -280,36 +698,53 @@ def intent_deposit(account, token, amount):
     else:
         raise ValueError(f"Token {token} not available on NEAR chain")
     
-    logger.info(f"Depositing {amount} {token} using token_id: {token_id}")
+    logger.info("Depositing %s %s using token_id: %s", amount, token, token_id)
+    
+    # Read the balance and both storage registrations in one concurrent round
+    # (NEAR token doesn't need registration)
+    storage_accounts = [] if token == "NEAR" else [
+        account_id for account_id in (account.account_id, "intents.near") if (token_id, account_id) not in _REGISTERED
+    ]
+    current_balance, *storage_balances = view_calls(account, [
+        (token_id, 'ft_balance_of', {'account_id': account.account_id})
+    ] + [
+        (token_id, 'storage_balance_of', {'account_id': account_id}) for account_id in storage_accounts
+    ])
     
     # Check current balance before deposit
     try:
-        current_balance = account.view_function(token_id, 'ft_balance_of', {'account_id': account.account_id})
-        logger.info(f"Current {token} balance: {current_balance}")
+        if isinstance(current_balance, Exception):
+            raise current_balance
+        logger.info("Current %s balance: %s", token, current_balance)
         
-        if 'result' in current_balance:
-            human_balance = from_decimals(current_balance['result'], token)
-            logger.info(f"Current {token} balance (human readable): {human_balance}")
-            
-            if human_balance < amount:
-                logger.error(f"Insufficient {token} balance: have {human_balance}, need {amount}")
-                raise ValueError(f"Insufficient {token} balance: have {human_balance}, need {amount}")
+        human_balance = from_decimals(current_balance, token)
+        logger.info("Current %s balance (human readable): %s", token, human_balance)
+        
+        if human_balance < amount:
+            logger.error("Insufficient %s balance: have %s, need %s", token, human_balance, amount)
+            raise ValueError(f"Insufficient {token} balance: have {human_balance}, need {amount}")
     except Exception as e:
-        logger.warning(f"Could not check {token} balance: {str(e)}")
+        logger.warning("Could not check %s balance: %s", token, e)
     
-    # Register storage if needed (for both user and intents contract)
-    try:
-        register_token_storage(account, token, other_account="intents.near")
-    except Exception as e:
-        logger.error(f"Error registering token storage: {str(e)}")
-        raise e
+    # Register storage only for the accounts found unregistered, already known so skip re-checking
+    missing = [
+        account_id for account_id, storage_balance in zip(storage_accounts, storage_balances)
+        if not storage_balance or isinstance(storage_balance, Exception)
+    ]
+    _REGISTERED.update((token_id, account_id) for account_id in storage_accounts if account_id not in missing)
+    if missing:
+        try:
+            register_token_storage(account, token, *missing, force=True)
+        except Exception as e:
+            logger.error("Error registering token storage: %s", e)
+            raise e
     
     # Use config's decimal conversion
     amount_base = config.to_decimals(amount, token)
     if not amount_base:
         raise ValueError(f"Invalid amount for {token}")
     
-    logger.info(f"Transferring {amount_base} base units of {token} to intents.near")
+    logger.info("Transferring %s base units of %s to intents.near", amount_base, token)
     
     # Execute the transfer
     try:
@@ -318,11 +753,12 @@ def intent_deposit(account, token, amount):
             "amount": amount_base,
             "msg": ""
         }, MAX_GAS, 1)
+        invalidate_balances(account)
         
-        logger.info(f"Transfer result: {result}")
+        logger.info("Transfer result: %s", result)
         return result
     except Exception as e:
-        logger.error(f"Transfer failed: {str(e)}")
+        logger.error("Transfer failed: %s", e)
         
         # Check if this is a balance issue
         if "doesn't have enough balance" in str(e):
@@ -331,13 +767,26 @@ def intent_deposit(account, token, amount):
                 balance_check = account.view_function(token_id, 'ft_balance_of', {'account_id': account.account_id})
                 if 'result' in balance_check:
                     human_balance = from_decimals(balance_check['result'], token)
-                    logger.error(f"Confirmed insufficient balance: have {human_balance}, need {amount}")
+                    logger.error("Confirmed insufficient balance: have %s, need %s", human_balance, amount)
             except Exception:
                 pass
         
         raise e
 
 
+@functools.lru_cache(maxsize=64)
+def _public_key_args(account_id, public_key):
+    """has_public_key / add_public_key args, built once per key (not to be mutated)"""
+    return {"account_id": account_id, "public_key": public_key}
+
+
+def _has_public_key(account, public_key):
+    """Check whether a public key is registered for the account with the intents contract"""
+    return account.view_function(
+        "intents.near", "has_public_key", _public_key_args(account.account_id, public_key)
+    )['result']
+
+
 def register_intent_public_key(account):
     """
     Register a public key with the intents contract if not already registered
@@ -350,80 +799,77 @@ def register_intent_public_key(account):
     """
     try:
         # Format the public key correctly
-        public_key = "ed25519:" + base58.b58encode(account.signer.public_key).decode('utf-8')
-        logger.info(f"Checking if public key {public_key} is registered for {account.account_id}")
+        public_key = _public_key_str(account.signer)
+        if (account.account_id, public_key) in _REGISTERED:
+            return "Key already registered"
+        logger.info("Checking if public key %s is registered for %s", public_key, account.account_id)
         
         # Check if already registered - INCLUDE ACCOUNT_ID in the parameters
+        key_args = _public_key_args(account.account_id, public_key)
         try:
-            result = account.view_function(
-                "intents.near",
-                "has_public_key",
-                {
-                    "account_id": account.account_id,  # Add account_id parameter
-                    "public_key": public_key
-                }
-            )
-            
-            if not result['result']:
-                logger.info(f"Registering public key for account {account.account_id}")
+            if not _has_public_key(account, public_key):
+                logger.info("Registering public key for account %s", account.account_id)
                 # Include account_id in the registration call as well
-                account.function_call("intents.near", "add_public_key", {
-                    "account_id": account.account_id,  # Add account_id parameter
-                    "public_key": public_key
-                }, MAX_GAS, 1)
-                time.sleep(3)  # Wait longer for registration to complete
+                account.function_call("intents.near", "add_public_key", key_args, MAX_GAS, 1)
+                # Wait until the key is visible rather than a fixed time
+                if _poll_until(lambda: _has_public_key(account, public_key)):
+                    _REGISTERED.add((account.account_id, public_key))
                 return "Key registered"
             else:
-                logger.info(f"Public key already registered for account {account.account_id}")
+                logger.info("Public key already registered for account %s", account.account_id)
+                _REGISTERED.add((account.account_id, public_key))
                 return "Key already registered"
         except Exception as e:
             # If the view function fails, try to register the key directly
-            logger.warning(f"Error checking if public key is registered: {str(e)}")
-            logger.info(f"Attempting to register public key directly")
+            logger.warning("Error checking if public key is registered: %s", e)
+            logger.info("Attempting to register public key directly")
             
             # Include account_id in the registration call
-            account.function_call("intents.near", "add_public_key", {
-                "account_id": account.account_id,  # Add account_id parameter
-                "public_key": public_key
-            }, MAX_GAS, 1)
-            time.sleep(3)  # Wait longer for registration to complete
+            account.function_call("intents.near", "add_public_key", key_args, MAX_GAS, 1)
+            if _poll_until(lambda: _has_public_key(account, public_key)):
+                _REGISTERED.add((account.account_id, public_key))
             return "Key registration attempted"
     except Exception as e:
-        logger.error(f"Error registering public key: {str(e)}")
+        logger.error("Error registering public key: %s", e)
         raise e
 
 
 def register_intents_storage(account):
     """Register storage with the intents contract"""
+    if ("intents.near", account.account_id) in _REGISTERED:
+        return "Already registered"
     try:
         # Check if already registered
         storage_balance = account.view_function("intents.near", 'storage_balance_of', {'account_id': account.account_id})
-        logger.info(f"Intents storage balance check result: {storage_balance}")
+        logger.info("Intents storage balance check result: %s", storage_balance)
         
         if not storage_balance.get('result'):
-            logger.info(f"Registering storage for {account.account_id} with intents.near")
+            logger.info("Registering storage for %s with intents.near", account.account_id)
             result = account.function_call(
                 "intents.near",
                 'storage_deposit',  # Changed from register_account to storage_deposit
                 {'account_id': account.account_id},
                 MAX_GAS,
-                1250000000000000000000  # 0.00125 NEAR
+                STORAGE_DEPOSIT
             )
-            logger.info(f"Storage registration result: {result}")
-            time.sleep(2)
+            logger.info("Storage registration result: %s", result)
             
-            # Verify registration was successful
-            verify_storage = account.view_function("intents.near", 'storage_balance_of', {'account_id': account.account_id})
-            logger.info(f"Storage registration verification: {verify_storage}")
-            if not verify_storage.get('result'):
-                logger.error(f"Storage registration failed for {account.account_id} with intents.near")
+            # Verify registration was successful, polling until it is visible
+            verify_storage = _poll_until(lambda: account.view_function(
+                "intents.near", 'storage_balance_of', {'account_id': account.account_id}
+            ).get('result'))
+            logger.info("Storage registration verification: %s", verify_storage)
+            if not verify_storage:
+                logger.error("Storage registration failed for %s with intents.near", account.account_id)
                 return "Storage registration failed"
+            _REGISTERED.add(("intents.near", account.account_id))
             return "Storage registered"
         else:
-            logger.info(f"Account {account.account_id} already registered with intents.near")
+            logger.info("Account %s already registered with intents.near", account.account_id)
+            _REGISTERED.add(("intents.near", account.account_id))
             return "Already registered"
     except Exception as e:
-        logger.error(f"Error registering intents storage: {str(e)}")
+        logger.error("Error registering intents storage: %s", e)
         return f"Error: {str(e)}"
 
 
@@ -454,52 +900,265 @@ class IntentRequest(object):
         message = {
             "defuse_asset_identifier_in": self.asset_in["asset"],
             "defuse_asset_identifier_out": self.asset_out["asset"],
-            "exact_amount_in": str(self.asset_in["amount"]),
-            "exact_amount_out": str(self.asset_out["amount"]),
             "min_deadline_ms": self.min_deadline_ms,
         }
-        if self.asset_in["amount"] is None:
-            del message["exact_amount_in"]
-        if self.asset_out["amount"] is None:
-            del message["exact_amount_out"]
+        if self.asset_in["amount"] is not None:
+            message["exact_amount_in"] = str(self.asset_in["amount"])
+        if self.asset_out["amount"] is not None:
+            message["exact_amount_out"] = str(self.asset_out["amount"])
         return message
 
 
+def _quote_params(request):
+    """Builds the solver bus quote params for an IntentRequest."""
+    return {
+        "defuse_asset_identifier_in": request.asset_in["asset"],
+        "defuse_asset_identifier_out": request.asset_out["asset"],
+        "exact_amount_in": str(request.asset_in["amount"])
+    }
+
+
+def _is_quotable(request):
+    """Checks that an IntentRequest resolved both assets and an input amount."""
+    return bool(request.asset_in["asset"] and request.asset_out["asset"] and request.asset_in["amount"])
+
+
+# (asset_in, asset_out, exact_amount_in) -> (monotonic expiry, quotes) of recent solver answers,
+# well inside the quotes' own validity window
+QUOTE_TTL = float(os.getenv('INTENTS_QUOTE_TTL', '3'))
+_QUOTE_CACHE = {}
+
+
+def _take_cached_quotes(params):
+    """
+    Quotes fetched for the same params less than QUOTE_TTL seconds ago, or None
+    A quote_hash can only be published once, so the entry is popped and handed
+    to a single caller, concurrent callers for the same amount fetch their own
+    """
+    entry = _QUOTE_CACHE.pop(tuple(params.values()), None)
+    if entry and time.monotonic() < entry[0]:
+        return entry[1]
+    return None
+
+
+def _store_quotes(params, quotes):
+    if quotes:
+        now = time.monotonic()
+        # Keys include the amount, so drop expired answers here or varying amounts grow the cache forever
+        for key, (expiry, _) in list(_QUOTE_CACHE.items()):
+            if expiry <= now:
+                _QUOTE_CACHE.pop(key, None)
+        _QUOTE_CACHE[tuple(params.values())] = (now + QUOTE_TTL, quotes)
+    return quotes
+
+
+def _forget_quotes(quote_hashes):
+    """Drop cached quote lists containing any of the given (now consumed) quote hashes"""
+    consumed = set(quote_hashes)
+    for key, (_, quotes) in list(_QUOTE_CACHE.items()):
+        if any(quote.get("quote_hash") in consumed for quote in quotes):
+            _QUOTE_CACHE.pop(key, None)
+
+
 def fetch_options(request):
     """Fetches the trading options from the solver bus."""
+    # Unsupported tokens resolve to None, don't spend a round-trip on a request the bus will reject
+    if not _is_quotable(request):
+        logger.error("Invalid quote request: %s -> %s", request.asset_in, request.asset_out)
+        return []
+
+    params = _quote_params(request)
+    quotes = _take_cached_quotes(params)
+    if quotes is not None:
+        return quotes
+
     rpc_request = {
         "jsonrpc": "2.0",
         "id": 1,
         "method": "quote",
-        "params": [{
-            "defuse_asset_identifier_in": request.asset_in["asset"],
-            "defuse_asset_identifier_out": request.asset_out["asset"],
-            "exact_amount_in": str(request.asset_in["amount"])
-        }]
+        "params": [params]
     }
-    
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Quote request: %s", _dumps(rpc_request))
+
     try:
-        response = requests.post(SOLVER_BUS_URL, json=rpc_request)
+        response = SESSION.post(SOLVER_BUS_URL, data=_dumpb(rpc_request), timeout=SOLVER_BUS_TIMEOUT)
         if response.status_code != 200:
-            logger.error(f"Error from solver bus: {response.text}")
+            logger.error("Error from solver bus: %s", response.text)
             return []
             
-        result = response.json()
+        result = _loads(response.content)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Quote response: %s", _dumps(result))
         if "error" in result:
-            logger.error(f"RPC error: {result['error']}")
+            logger.error("RPC error: %s", result['error'])
             return []
             
         quotes = result.get("result", [])
         if not quotes:
             logger.info("No quotes available for this swap")
             
-        return quotes
+        return _store_quotes(params, quotes)
             
     except Exception as e:
-        logger.error(f"Error fetching quotes: {str(e)}")
+        logger.error("Error fetching quotes: %s", e)
         return []
 
 
+def solver_rpc_batch(calls):
+    """
+    Sends several solver bus JSON-RPC calls as a single batch request
+
+    Args:
+        calls: List of {"method": str, "params": list} dicts
+
+    Returns:
+        list: One JSON-RPC response per call, in the same order as calls.
+            Calls the solver bus did not answer get an {"error": ...} entry
+    """
+    if not calls:
+        return []
+
+    rpc_batch = [
+        {"jsonrpc": "2.0", "id": i, "method": call["method"], "params": call["params"]}
+        for i, call in enumerate(calls)
+    ]
+    response = SESSION.post(SOLVER_BUS_URL, data=_dumpb(rpc_batch), timeout=SOLVER_BUS_TIMEOUT)
+    if response.status_code != 200:
+        raise Exception(f"Error from solver bus: {response.text}")
+
+    results = _loads(response.content)
+    if not isinstance(results, list):
+        raise Exception(f"RPC error: {results.get('error', results)}")
+
+    # Batch responses may arrive in any order, match them back by id
+    ordered = [{"id": i, "error": "no response"} for i in range(len(calls))]
+    for result in results:
+        index = result.get("id")
+        if isinstance(index, int) and 0 <= index < len(ordered):
+            ordered[index] = result
+    return ordered
+
+
+def fetch_options_many(intent_requests):
+    """
+    Fetches the trading options for several requests in JSON-RPC batch calls
+    of at most MAX_BATCH quotes, falling back to concurrent single calls for
+    any batch the solver bus rejects, or for every chunk when
+    SOLVER_BUS_BATCHING is off
+
+    Args:
+        intent_requests: List of IntentRequest objects
+
+    Returns:
+        list: One list of quotes per request, in the same order as intent_requests
+    """
+    options = [[] for _ in intent_requests]
+    indices = [i for i, request in enumerate(intent_requests) if _is_quotable(request)]
+    if len(indices) < len(intent_requests):
+        logger.error("Skipping %s invalid quote requests", len(intent_requests) - len(indices))
+    params = {i: _quote_params(intent_requests[i]) for i in indices}
+    for i in indices:
+        options[i] = _take_cached_quotes(params[i]) or []
+    indices = [i for i in indices if not options[i]]
+
+    def _fetch_individually(chunk):
+        chunk_options = _parallel_map(lambda i: fetch_options(intent_requests[i]), chunk, workers=len(chunk))
+        for index, quotes in zip(chunk, chunk_options):
+            options[index] = quotes
+
+    for start in range(0, len(indices), MAX_BATCH):
+        chunk = indices[start:start + MAX_BATCH]
+        if not SOLVER_BUS_BATCHING:
+            _fetch_individually(chunk)
+            continue
+        try:
+            results = solver_rpc_batch([
+                {"method": "quote", "params": [params[i]]} for i in chunk
+            ])
+        except Exception as e:
+            logger.warning("Batched quotes failed, fetching individually: %s", e)
+            _fetch_individually(chunk)
+            continue
+
+        for index, result in zip(chunk, results):
+            if "error" in result:
+                logger.error("RPC error for quote %s: %s", index, result['error'])
+                continue
+            options[index] = _store_quotes(params[index], result.get("result") or [])
+
+    return options
+
+
+# Quote requests from concurrent threads arriving within this window share one solver bus batch
+QUOTE_BATCH_WINDOW = float(os.getenv('INTENTS_QUOTE_BATCH_MS', '5')) / 1000
+# Followers give up on a batch that hasn't answered in this long (covers the retried POSTs)
+QUOTE_BATCH_TIMEOUT = QUOTE_BATCH_WINDOW + 3 * sum(SOLVER_BUS_TIMEOUT)
+_quote_queue = []
+_quotes_in_flight = 0
+_quote_queue_lock = threading.Lock()
+
+
+def fetch_options_coalesced(request):
+    """
+    Fetches the trading options for one request, batched with concurrent callers
+    A caller arriving while no other quote is in flight fetches right away.
+    Otherwise the first queued caller waits QUOTE_BATCH_WINDOW seconds, then
+    sends every request queued meanwhile through fetch_options_many and hands
+    each caller its own quotes
+    """
+    global _quotes_in_flight
+    if QUOTE_BATCH_WINDOW <= 0:
+        return fetch_options(request)
+
+    future = Future()
+    with _quote_queue_lock:
+        _quote_queue.append((request, future))
+        leader = len(_quote_queue) == 1
+        concurrent = _quotes_in_flight > 0
+        _quotes_in_flight += 1
+    try:
+        if leader:
+            _lead_quote_batch(concurrent)
+        return future.result(timeout=QUOTE_BATCH_TIMEOUT)
+    except FuturesTimeoutError:
+        logger.error("Quote batch timed out after %ss", QUOTE_BATCH_TIMEOUT)
+        return []
+    finally:
+        with _quote_queue_lock:
+            _quotes_in_flight -= 1
+
+
+def _lead_quote_batch(wait):
+    """Drain the quote queue, optionally after the batch window, and resolve every queued future"""
+    global _quote_queue
+    batch = None
+    try:
+        if wait:
+            time.sleep(QUOTE_BATCH_WINDOW)
+        with _quote_queue_lock:
+            batch, _quote_queue = _quote_queue, []
+        if len(batch) == 1:
+            results = [fetch_options(batch[0][0])]
+        else:
+            results = fetch_options_many([queued for queued, _ in batch])
+        for (_, queued_future), quotes in zip(batch, results):
+            queued_future.set_result(quotes)
+    except Exception as e:
+        for _, queued_future in batch or []:
+            if not queued_future.done():
+                queued_future.set_exception(e)
+    finally:
+        # Interrupted (e.g. KeyboardInterrupt) before or during the fan-out, don't leave followers waiting
+        if batch is None:
+            with _quote_queue_lock:
+                batch, _quote_queue = _quote_queue, []
+        for _, queued_future in batch:
+            if not queued_future.done():
+                queued_future.set_exception(RuntimeError("Quote batch aborted"))
+
+
 def publish_intent(signed_intent):
     """Publishes the signed intent to the solver bus."""
     rpc_request = {
@@ -508,17 +1167,30 @@ def publish_intent(signed_intent):
         "method": "publish_intent",
         "params": [signed_intent]
     }
-    response = requests.post(SOLVER_BUS_URL, json=rpc_request)
-    return response.json()
+    response = PUBLISH_SESSION.post(SOLVER_BUS_URL, data=_dumpb(rpc_request), timeout=SOLVER_BUS_TIMEOUT)
+    _forget_published(signed_intent)
+    return _loads(response.content)
+
+
+def _forget_published(signed_intent):
+    """Any published intent can move intents balances, and its quotes can't be reused"""
+    invalidate_balances()
+    _forget_quotes(signed_intent.get("quote_hashes", []))
 
 
 def select_best_option(options):
     """Selects the best option from the list of options."""
-    best_option = None
-    for option in options:
-        if not best_option or option["amount_out"] > best_option["amount_out"]:
-            best_option = option
-    return best_option
+    # amount_out is a decimal string, compare numerically rather than lexically
+    # and skip quotes whose amount is missing or not a plain ASCII integer
+    # (isdigit alone accepts e.g. '²', which int() rejects)
+    valid = (option for option in options if _is_base_units(option.get("amount_out")))
+    return max(valid, key=lambda option: int(option["amount_out"]), default=None)
+
+
+def _is_base_units(amount):
+    """Check that an amount is a non-empty string of ASCII digits"""
+    amount = str(amount) if amount is not None else ""
+    return amount.isascii() and amount.isdecimal()
 
 
 def intent_swap(account, token_in: str, amount_in: float, token_out: str, chain_out: str = "eth") -> dict:
@@ -529,12 +1201,10 @@ def intent_swap(account, token_in: str, amount_in: float, token_out: str, chain_
     if not config.get_token_by_symbol(token_out, chain_out):
         raise ValueError(f"Token {token_out} not supported on {chain_out}")
     
-    # Convert amount using config helper
-    amount_in_base = config.to_decimals(amount_in, token_in)
-    
-    # Get quote from solver
+    # Get quote from solver, the request resolves asset ids and base units once
     request = IntentRequest().asset_in(token_in, amount_in).asset_out(token_out, chain=chain_out)
-    options = fetch_options(request)
+    amount_in_base = request.asset_in["amount"]
+    options = fetch_options_coalesced(request)
     best_option = select_best_option(options)
     
     if not best_option:
@@ -552,10 +1222,10 @@ def intent_swap(account, token_in: str, amount_in: float, token_out: str, chain_
     )
     
     # Submit intent
-    signed_intent = PublishIntent(
-        signed_data=quote,
-        quote_hashes=[best_option['quote_hash']]
-    )
+    signed_intent: PublishIntent = {
+        "signed_data": quote,
+        "quote_hashes": [best_option['quote_hash']]
+    }
     
     return {
         **publish_intent(signed_intent),
@@ -563,20 +1233,59 @@ def intent_swap(account, token_in: str, amount_in: float, token_out: str, chain_
     }
 
 
+# Last formatted deadline as ((minute, days), deadline), quotes built in the same minute share it
+_deadline_cache = (None, None)
+
+
 def get_future_deadline(days=365):
     """Generate a deadline timestamp that's X days in the future"""
-    from datetime import datetime, timedelta, UTC
-    future_date = datetime.now(UTC) + timedelta(days=days)
-    return future_date.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+    global _deadline_cache
+    key = (int(time.time()) // 60, days)
+    if _deadline_cache[0] != key:
+        _deadline_cache = (key, time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(key[0] * 60 + days * 86400)))
+    return _deadline_cache[1]
+
+
+# (account_id, asset_id) -> (monotonic time, base-unit balance) of recent mt_balance_of reads
+BALANCE_TTL = float(os.getenv('INTENTS_BALANCE_TTL', '1.0'))
+_BALANCE_CACHE = {}
 
 
-def get_intent_balance(account, token, chain="near"):
+def _cached_balance(account, nep141_token_id, max_age):
+    """Base-unit balance read less than max_age seconds ago, or None"""
+    entry = _BALANCE_CACHE.get((account.account_id, nep141_token_id))
+    if entry and time.monotonic() - entry[0] < max_age:
+        return entry[1]
+    return None
+
+
+def _store_balance(account, nep141_token_id, balance):
+    _BALANCE_CACHE[(account.account_id, nep141_token_id)] = (time.monotonic(), balance)
+    return balance
+
+
+def invalidate_balances(account=None):
+    """
+    Drop cached intents balances after a state-changing call
+    Args:
+        account: NEAR account whose balances to drop, all accounts if None
+    """
+    if account is None:
+        _BALANCE_CACHE.clear()
+        return
+    # list() snapshots the keys, the intents-io loop thread may store balances meanwhile
+    for key in [key for key in list(_BALANCE_CACHE) if key[0] == account.account_id]:
+        _BALANCE_CACHE.pop(key, None)
+
+
+def get_intent_balance(account, token, chain="near", max_age=BALANCE_TTL):
     """
     Get the balance of a specific token in the intents contract for an account
     Args:
         account: NEAR account
         token: Token symbol (e.g., 'USDC', 'NEAR', 'ETH')
         chain: Chain name (e.g., 'near', 'eth') - defaults to 'near'
+        max_age: Seconds a cached balance may be reused for, 0 to always query
     Returns:
         float: The balance in human-readable format
     """
@@ -587,24 +1296,377 @@ def get_intent_balance(account, token, chain="near"):
         raise ValueError(f"Token {token} not supported on chain {chain}")
     
     try:
-        balance_response = account.view_function(
-            'intents.near',
-            'mt_balance_of',
-            {
-                'token_id': nep141_token_id,
-                'account_id': account.account_id
-            }
-        )
-        
-        if balance_response and 'result' in balance_response:
-            token_info = get_token_by_symbol(token)
-            decimals = token_info['decimals'] if token_info else 6
-            return float(balance_response['result']) / (10 ** decimals)
+        balance = _cached_balance(account, nep141_token_id, max_age)
+        if balance is None:
+            balance = _get_intent_balance_raw(account, nep141_token_id)
+        if balance is not None:
+            return float(balance) / config.POW10[_token_decimals(token)]
     except Exception as e:
-        logger.error(f"Error getting balance: {str(e)}")
+        logger.error("Error getting balance: %s", e)
     return 0.0
 
 
+def _token_decimals(token):
+    """Decimals of a token, 6 for tokens missing from the config"""
+    return config.DECIMALS_BY_SYMBOL.get(token, 6)
+
+
+def _get_intent_balance_raw(account, nep141_token_id):
+    """Get the base-unit balance string of an already resolved asset id in the intents contract"""
+    balance_response = account.view_function(
+        'intents.near',
+        'mt_balance_of',
+        {
+            'token_id': nep141_token_id,
+            'account_id': account.account_id
+        }
+    )
+    if balance_response and 'result' in balance_response:
+        return _store_balance(account, nep141_token_id, balance_response['result'])
+    return None
+
+
+def _view_request(contract_id, method_name, args):
+    """Build the NEAR JSON-RPC query payload for a contract view call"""
+    return {
+        "jsonrpc": "2.0",
+        "id": "dontcare",
+        "method": "query",
+        "params": {
+            "request_type": "call_function",
+            "finality": "optimistic",
+            "account_id": contract_id,
+            "method_name": method_name,
+            "args_base64": base64.b64encode(_dumpb(args)).decode('ascii')
+        }
+    }
+
+
+def _view_call(account, contract_id, method_name, args):
+    """
+    Call a contract view method through the shared keep-alive session
+    Returns the decoded result, raising on RPC errors
+    """
+    response = SESSION.post(
+        account.provider.rpc_addr(),
+        data=_dumpb(_view_request(contract_id, method_name, args)),
+        timeout=NEAR_RPC_TIMEOUT
+    )
+    response.raise_for_status()
+    result = _loads(response.content)
+    if "error" in result:
+        raise Exception(f"View call {contract_id}.{method_name} failed: {result['error']}")
+    return _loads(bytes(result["result"]["result"]))
+
+
+@functools.lru_cache(maxsize=16)
+def _intent_tokens(chain):
+    """Resolve the (symbol, defuse_asset_id) pairs of a chain's supported tokens once"""
+    return tuple(
+        (token["symbol"], token["chains"][chain]["defuse_asset_id"])
+        for token in config.get_supported_tokens(chain=chain)
+        if token["chains"][chain].get("defuse_asset_id")
+    )
+
+
+def get_all_intent_balances(account, chain="near", known_nonzero=None):
+    """
+    Get the balances of every supported token on a chain in the intents contract
+    Uses a single mt_batch_balance_of view call instead of one call per token
+    Args:
+        account: NEAR account
+        chain: Chain name (e.g., 'near', 'eth') - defaults to 'near'
+        known_nonzero: Optional set of token symbols to restrict the query to,
+            e.g. from a previous scan, other tokens are skipped
+    Returns:
+        dict: Token symbol mapped to its balance in human-readable format
+    """
+    tokens = _intent_tokens(chain)
+    if known_nonzero is not None:
+        tokens = [(symbol, asset_id) for symbol, asset_id in tokens if symbol in known_nonzero]
+    balances = {symbol: 0.0 for symbol, _ in tokens}
+    if not tokens:
+        return balances
+
+    try:
+        amounts = _view_call(account, 'intents.near', 'mt_batch_balance_of', {
+            'account_id': account.account_id,
+            'token_ids': [asset_id for _, asset_id in tokens]
+        })
+        for (symbol, _), amount in zip(tokens, amounts):
+            balances[symbol] = from_decimals(amount, symbol)
+    except Exception as e:
+        logger.error("Error getting balances: %s", e)
+    return balances
+
+
+def _client_session():
+    """Creates an aiohttp session for the async solver bus and NEAR RPC helpers"""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60),
+        timeout=aiohttp.ClientTimeout(total=sum(SOLVER_BUS_TIMEOUT)),
+        json_serialize=_dumps,
+        trust_env=True
+    )
+
+
+# The sync wrappers run their coroutines on one background event loop so a
+# single aiohttp session, and its keep-alive connections, outlives each call
+_io_loop = None
+_io_thread = None
+_io_session = None
+_io_lock = threading.Lock()
+
+
+def _get_io_loop():
+    global _io_loop, _io_thread
+    with _io_lock:
+        if _io_loop is None:
+            _io_loop = asyncio.new_event_loop()
+            _io_thread = threading.Thread(target=_io_loop.run_forever, name="intents-io", daemon=True)
+            _io_thread.start()
+        return _io_loop
+
+
+def get_session():
+    """Get the shared aiohttp session, must be called on the background loop"""
+    global _io_session
+    with _io_lock:
+        if _io_loop is None or asyncio.get_running_loop() is not _io_loop:
+            raise RuntimeError("get_session() must run on the intents IO loop")
+        if _io_session is None or _io_session.closed:
+            _io_session = _client_session()
+        return _io_session
+
+
+def _run_with_session(coro_fn):
+    """Run coro_fn(session) on the background loop with the shared session and wait for it"""
+    async def _call():
+        return await coro_fn(get_session())
+
+    return asyncio.run_coroutine_threadsafe(_call(), _get_io_loop()).result()
+
+
+async def _gather_bounded(coros, limit=MAX_CONCURRENT_CALLS, return_exceptions=False):
+    """
+    asyncio.gather with at most limit coroutines in flight
+    Queued calls then don't spend their aiohttp timeout waiting for a pooled connection
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def _bounded(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*[_bounded(coro) for coro in coros], return_exceptions=return_exceptions)
+
+
+def shutdown_sessions():
+    """Close the shared aiohttp session, then stop and close the background loop, e.g. at process exit"""
+    global _io_loop, _io_thread, _io_session
+    with _io_lock:
+        loop, thread, session = _io_loop, _io_thread, _io_session
+        _io_loop = _io_thread = _io_session = None
+    if loop is None:
+        return
+    if session is not None and not session.closed:
+        asyncio.run_coroutine_threadsafe(session.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+# Close the pooled connections cleanly instead of leaving "Unclosed client session" warnings at exit
+atexit.register(shutdown_sessions)
+
+
+async def afetch_options(session, request):
+    """Async version of fetch_options using a shared aiohttp session."""
+    if not _is_quotable(request):
+        logger.error("Invalid quote request: %s -> %s", request.asset_in, request.asset_out)
+        return []
+
+    params = _quote_params(request)
+    quotes = _take_cached_quotes(params)
+    if quotes is not None:
+        return quotes
+
+    rpc_request = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "quote",
+        "params": [params]
+    }
+
+    try:
+        async with session.post(SOLVER_BUS_URL, json=rpc_request) as response:
+            if response.status != 200:
+                logger.error("Error from solver bus: %s", await response.text())
+                return []
+            result = _loads(await response.read())
+
+        if "error" in result:
+            logger.error("RPC error: %s", result['error'])
+            return []
+
+        quotes = result.get("result", [])
+        if not quotes:
+            logger.info("No quotes available for this swap")
+
+        return _store_quotes(params, quotes)
+
+    except Exception as e:
+        logger.error("Error fetching quotes: %s", e)
+        return []
+
+
+async def apublish_intent(session, signed_intent):
+    """Async version of publish_intent using a shared aiohttp session."""
+    rpc_request = {
+        "id": "dontcare",
+        "jsonrpc": "2.0",
+        "method": "publish_intent",
+        "params": [signed_intent]
+    }
+    async with session.post(SOLVER_BUS_URL, json=rpc_request) as response:
+        result = _loads(await response.read())
+    _forget_published(signed_intent)
+    return result
+
+
+async def aget_intent_balance(session, account, token, chain="near", max_age=BALANCE_TTL):
+    """
+    Async version of get_intent_balance
+    Queries the NEAR RPC node behind account.provider directly so several
+    balances can be in flight at once
+    """
+    nep141_token_id = get_defuse_asset_id(token, chain)
+
+    if not nep141_token_id:
+        raise ValueError(f"Token {token} not supported on chain {chain}")
+
+    try:
+        balance = _cached_balance(account, nep141_token_id, max_age)
+        if balance is None:
+            balance = await _aget_intent_balance_raw(session, account, nep141_token_id)
+        return float(balance) / config.POW10[_token_decimals(token)]
+    except Exception as e:
+        logger.error("Error getting balance: %s", e)
+    return 0.0
+
+
+async def _aget_intent_balance_raw(session, account, nep141_token_id):
+    """Async version of _get_intent_balance_raw, raises on RPC errors"""
+    return _store_balance(account, nep141_token_id, await aview_call(session, account, 'intents.near', 'mt_balance_of', {
+        'token_id': nep141_token_id,
+        'account_id': account.account_id
+    }))
+
+
+async def aview_call(session, account, contract_id, method_name, args):
+    """Async version of _view_call using a shared aiohttp session."""
+    async with session.post(
+        account.provider.rpc_addr(),
+        json=_view_request(contract_id, method_name, args),
+        timeout=aiohttp.ClientTimeout(total=sum(NEAR_RPC_TIMEOUT))
+    ) as response:
+        result = _loads(await response.read())
+    if "error" in result:
+        raise Exception(f"View call {contract_id}.{method_name} failed: {result['error']}")
+    return _loads(bytes(result["result"]["result"]))
+
+
+def view_calls(account, calls):
+    """
+    Run several independent contract view calls concurrently
+    Args:
+        account: NEAR account
+        calls: List of (contract_id, method_name, args) tuples
+    Returns:
+        list: Decoded results in the order of calls, failed calls are
+            returned as their exception instead of raising
+    """
+    async def _gather(session):
+        return await _gather_bounded([
+            aview_call(session, account, contract_id, method_name, args)
+            for contract_id, method_name, args in calls
+        ], return_exceptions=True)
+
+    return _run_with_session(_gather)
+
+
+def get_intent_balances(account, token, chains, max_age=BALANCE_TTL):
+    """
+    Get the balance of a token on several chains in one mt_batch_balance_of call
+    Args:
+        account: NEAR account
+        token: Token symbol (e.g., 'USDC')
+        chains: Chain names to query (e.g., ['eth', 'near'])
+        max_age: Seconds a cached balance may be reused for, 0 to always query
+    Returns:
+        dict: Chain name mapped to the balance in human-readable format
+    """
+    asset_ids = {}
+    for chain in chains:
+        asset_ids[chain] = get_defuse_asset_id(token, chain)
+        if not asset_ids[chain]:
+            raise ValueError(f"Token {token} not supported on chain {chain}")
+
+    raw = {asset_id: _cached_balance(account, asset_id, max_age) for asset_id in asset_ids.values()}
+    missing = [asset_id for asset_id, balance in raw.items() if balance is None]
+    if missing:
+        try:
+            amounts = _view_call(account, 'intents.near', 'mt_batch_balance_of', {
+                'account_id': account.account_id,
+                'token_ids': missing
+            })
+            for asset_id, amount in zip(missing, amounts):
+                raw[asset_id] = _store_balance(account, asset_id, amount)
+        except Exception as e:
+            logger.error("Error getting balances: %s", e)
+
+    scale = config.POW10[_token_decimals(token)]
+    return {
+        chain: float(raw[asset_id]) / scale if raw[asset_id] is not None else 0.0
+        for chain, asset_id in asset_ids.items()
+    }
+
+
+def find_funded_chain(account, token, amount, chains, chain_assets=None):
+    """
+    Find the first chain, in the given order, holding at least amount of a token
+    All balances are requested at once, the lookups still pending are
+    cancelled as soon as an earlier chain is known to be funded
+    Args:
+        chain_assets: Optional chain to defuse asset id map already resolved by the caller
+    Returns:
+        str: The chain name, or None if no chain has enough balance
+    """
+    if chain_assets is None:
+        chain_assets = {chain: get_defuse_asset_id(token, chain) for chain in chains}
+    scale = config.POW10[_token_decimals(token)]
+
+    async def _balance(session, chain):
+        try:
+            return float(await _aget_intent_balance_raw(session, account, chain_assets[chain])) / scale
+        except Exception as e:
+            logger.error("Error getting balance: %s", e)
+            return 0.0
+
+    async def _probe(session):
+        tasks = [asyncio.create_task(_balance(session, chain)) for chain in chains]
+        try:
+            for chain, task in zip(chains, tasks):
+                if await task >= amount:
+                    return chain
+        finally:
+            for task in tasks:
+                task.cancel()
+        return None
+
+    return _run_with_session(_probe)
+
+
 def smart_withdraw(account, token: str, amount: float, destination_address: str = None, destination_chain: str = None, source_chain: str = None) -> dict:
     """
     Smart router that picks the appropriate withdrawal method
@@ -625,98 +1687,106 @@ def smart_withdraw(account, token: str, amount: float, destination_address: str
         return withdraw_cross_chain(account, token, amount, destination_chain, destination_address)
 
 
-def withdraw_same_chain(account, token: str, amount: float, destination_address: str = None, source_chain: str = None) -> dict:
+# Chains probed, in order of preference, for a token to withdraw to NEAR
+_SOURCE_CHAINS = ("eth", "near", "arbitrum", "solana")
+
+
+def withdraw_same_chain(account, token: str, amount: float, destination_address: str = None, source_chain: str = None, conversion_option: dict = None) -> dict:
     """
     Withdraw tokens to same chain (e.g., NEAR to NEAR wallet)
     If token is on another chain, handles conversion first
+    A conversion_option already quoted for source_chain is used instead of fetching a new one
     """
     token_id = config.get_token_id(token, "near")
     destination_address = destination_address or account.account_id
+    # Resolve the token's asset id on every chain this function looks at once
+    chain_assets = {chain: config.get_defuse_asset_id(token, chain) for chain in _SOURCE_CHAINS}
+    if source_chain and source_chain not in chain_assets:
+        chain_assets[source_chain] = config.get_defuse_asset_id(token, source_chain)
     
-    logger.info(f"=== WITHDRAW SAME CHAIN ===")
-    logger.info(f"Token: {token}")
-    logger.info(f"Token ID: {token_id}")
-    logger.info(f"Amount: {amount}")
-    logger.info(f"Destination: {destination_address}")
-    logger.info(f"Source Chain: {source_chain}")
+    logger.info("=== WITHDRAW SAME CHAIN ===")
+    logger.info("Token: %s", token)
+    logger.info("Token ID: %s", token_id)
+    logger.info("Amount: %s", amount)
+    logger.info("Destination: %s", destination_address)
+    logger.info("Source Chain: %s", source_chain)
     
     # For NEAR token, we're always on NEAR chain
     if token == "NEAR":
         source_chain = "near"
     elif source_chain is None:
-        # Check balances to determine source chain
-        for chain in ["eth", "near", "arbitrum", "solana"]:
-            balance = get_intent_balance(account, token, chain=chain)
-            if balance >= amount:
-                source_chain = chain
-                break
+        # Check balances to determine source chain, querying all chains at once
+        candidate_chains = [chain for chain in _SOURCE_CHAINS if chain_assets[chain]]
+        source_chain = find_funded_chain(account, token, amount, candidate_chains, chain_assets)
                 
     if not source_chain:
         raise ValueError(f"Could not find source chain for {token} with sufficient balance")
     
-    logger.info(f"Determined source chain: {source_chain}")
+    logger.info("Determined source chain: %s", source_chain)
     
     # Check if token needs conversion to NEAR chain
-    current_chain_asset = config.get_defuse_asset_id(token, source_chain)
-    near_chain_asset = config.get_defuse_asset_id(token, "near")
+    current_chain_asset = chain_assets[source_chain]
+    near_chain_asset = chain_assets["near"]
     
-    logger.info(f"Current chain asset: {current_chain_asset}")
-    logger.info(f"NEAR chain asset: {near_chain_asset}")
+    logger.info("Current chain asset: %s", current_chain_asset)
+    logger.info("NEAR chain asset: %s", near_chain_asset)
     
     if current_chain_asset != near_chain_asset and source_chain != "near":
-        logger.info(f"\nConverting {token} from {source_chain} to NEAR chain...")
+        logger.info("\nConverting %s from %s to NEAR chain...", token, source_chain)
         # Need conversion quote first
         request = IntentRequest().asset_in(token, amount, chain=source_chain).asset_out(token, chain="near")
-        options = fetch_options(request)
-        best_option = select_best_option(options)
+        best_option = conversion_option or select_best_option(fetch_options(request))
         
         if not best_option:
             raise Exception(f"No conversion quote available for {token} to NEAR chain")
         
-        logger.info(f"Conversion quote: {best_option}")
+        logger.info("Conversion quote: %s", best_option)
         
         # Create and publish conversion quote first
         conversion_quote = create_token_diff_quote(
             account,
             token,
-            config.to_decimals(amount, token),
+            request.asset_in["amount"],
             token,
             best_option['amount_out'],
             quote_asset_in=best_option['defuse_asset_identifier_in'],
             quote_asset_out=best_option['defuse_asset_identifier_out']
         )
         
-        # Submit conversion intent
-        conversion_intent = PublishIntent(
-            signed_data=conversion_quote,
-            quote_hashes=[best_option['quote_hash']]
-        )
+        # Submit conversion intent, noting the NEAR chain balance it should raise
+        near_balance_before = get_intent_balance(account, token, "near", max_age=0)
+        conversion_intent: PublishIntent = {
+            "signed_data": conversion_quote,
+            "quote_hashes": [best_option['quote_hash']]
+        }
         
         conversion_result = publish_intent(conversion_intent)
-        logger.info("\nConversion Result:")
-        logger.info(json.dumps(conversion_result, indent=2))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Conversion result: %s", _dumps(conversion_result))
         
         # Use converted amount for withdrawal
         amount_base = best_option['amount_out']
-        time.sleep(3)  # Give time for conversion to complete
+        # Wait for the conversion to settle instead of sleeping a fixed time
+        if not _poll_until(lambda: get_intent_balance(account, token, "near", max_age=0) > near_balance_before):
+            logger.warning("Conversion of %s to NEAR chain not visible yet, withdrawing anyway", token)
     else:
         # No conversion needed, use direct amount
         amount_base = config.to_decimals(amount, token)
     
-    logger.info(f"Final amount_base for withdrawal: {amount_base}")
+    logger.info("Final amount_base for withdrawal: %s", amount_base)
     
     # Register storage for the token before withdrawal
     if token != "NEAR":  # NEAR token doesn't need registration
-        logger.info(f"\n=== REGISTERING TOKEN STORAGE ===")
-        logger.info(f"Token: {token}")
-        logger.info(f"Token ID: {token_id}")
-        logger.info(f"Destination: {destination_address}")
+        logger.info("\n=== REGISTERING TOKEN STORAGE ===")
+        logger.info("Token: %s", token)
+        logger.info("Token ID: %s", token_id)
+        logger.info("Destination: %s", destination_address)
         
         registration_success = register_token_storage(account, token, destination_address)
-        logger.info(f"Registration success: {registration_success}")
+        logger.info("Registration success: %s", registration_success)
         
         if not registration_success:
-            logger.warning(f"Failed to register {destination_address} with {token} token. Withdrawal may fail.")
+            logger.warning("Failed to register %s with %s token. Withdrawal may fail.", destination_address, token)
             
         # Double-check registration
         try:
@@ -725,40 +1795,81 @@ def withdraw_same_chain(account, token: str, amount: float, destination_address:
                 'storage_balance_of',
                 {'account_id': destination_address}
             )
-            logger.info(f"Storage balance check after registration: {storage_balance}")
+            logger.info("Storage balance check after registration: %s", storage_balance)
             
             if not storage_balance.get('result'):
-                logger.warning(f"Account still not registered with {token} token after registration attempt")
+                logger.warning("Account still not registered with %s token after registration attempt", token)
         except Exception as e:
-            logger.error(f"Error checking storage balance: {str(e)}")
+            logger.error("Error checking storage balance: %s", e)
     
     # Now do the withdrawal with converted amount
-    logger.info(f"\n=== CREATING WITHDRAWAL INTENT ===")
-    quote = Quote(
-        signer_id=account.account_id,
-        nonce=base64.b64encode(random.getrandbits(256).to_bytes(32, byteorder='big')).decode('utf-8'),
-        verifying_contract="intents.near",
-        deadline=get_future_deadline(),
-        intents=[{
-            "intent": "ft_withdraw",
-            "token": token_id,
-            "receiver_id": destination_address,
-            "amount": str(amount_base)
-        }]
-    )
+    logger.info("\n=== CREATING WITHDRAWAL INTENT ===")
+    quote = _build_quote(account, [{
+        "intent": "ft_withdraw",
+        "token": token_id,
+        "receiver_id": destination_address,
+        "amount": str(amount_base)
+    }])
     
-    logger.info(f"Withdrawal quote: {json.dumps(quote, indent=2)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Withdrawal quote: %s", _dumps(quote))
     
-    signed_quote = sign_quote(account, json.dumps(quote))
-    signed_intent = PublishIntent(signed_data=signed_quote)
+    signed_quote = sign_quote(account, _dumpb(quote))
+    signed_intent: PublishIntent = {"signed_data": signed_quote}
     
-    logger.info(f"Publishing withdrawal intent...")
+    logger.info("Publishing withdrawal intent...")
     result = publish_intent(signed_intent)
-    logger.info(f"Withdrawal result: {json.dumps(result, indent=2)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Withdrawal result: %s", _dumps(result))
     
     return result
 
 
+def withdraw_best_chain_to_near(account, token: str, amount: float, destination_address: str = None, chains=("eth", "arbitrum", "solana", "base")) -> dict:
+    """
+    Withdraw tokens to NEAR from whichever source chain gives the best conversion
+    Args:
+        account: NEAR account
+        token: Token symbol (e.g., 'USDC')
+        amount: Amount to withdraw
+        destination_address: Address to withdraw to (defaults to account.account_id)
+        chains: Candidate source chains, probed concurrently
+    """
+    # Only quote chains that hold enough of the token, balances are read concurrently
+    candidate_chains = [chain for chain in chains if get_defuse_asset_id(token, chain)]
+    balances = get_intent_balances(account, token, candidate_chains)
+    funded_chains = [chain for chain in candidate_chains if balances[chain] >= amount]
+    if not funded_chains:
+        raise ValueError(f"Could not find source chain for {token} with sufficient balance")
+
+    # One batched solver call quotes every funded chain at once
+    requests_by_chain = [
+        IntentRequest().asset_in(token, amount, chain=chain).asset_out(token, chain="near")
+        for chain in funded_chains
+    ]
+    options_by_chain = fetch_options_many(requests_by_chain)
+    best_chain, best_option = None, None
+    for chain, options in zip(funded_chains, options_by_chain):
+        option = select_best_option(options)
+        if option and (best_option is None or int(option["amount_out"]) > int(best_option["amount_out"])):
+            best_chain, best_option = chain, option
+
+    if not best_option:
+        raise Exception(f"No conversion quote available for {token} to NEAR chain")
+
+    logger.info("Best source chain for %s: %s", token, best_chain)
+    return withdraw_same_chain(account, token, amount, destination_address, best_chain, conversion_option=best_option)
+
+
+# Default withdrawal address for each chain, read from the environment once at import
+_DEFAULT_DESTINATIONS = {
+    "solana": os.getenv('SOLANA_ACCOUNT_ID'),
+    "eth": os.getenv('ETHEREUM_ACCOUNT_ID'),
+    "arbitrum": os.getenv('ETHEREUM_ACCOUNT_ID'),
+    "base": os.getenv('ETHEREUM_ACCOUNT_ID')
+}
+
+
 def withdraw_cross_chain(account, token: str, amount: float, destination_chain: str, destination_address: str = None) -> dict:
     """Withdraw tokens to different chain"""
     # Get token config and validate
@@ -767,11 +1878,7 @@ def withdraw_cross_chain(account, token: str, amount: float, destination_chain:
         raise ValueError(f"Token {token} not supported")
     
     # Get destination address
-    if not destination_address:
-        if destination_chain == "solana":
-            destination_address = os.getenv('SOLANA_ACCOUNT_ID')
-        elif destination_chain in ["eth", "arbitrum", "base"]:
-            destination_address = os.getenv('ETHEREUM_ACCOUNT_ID')
+    destination_address = destination_address or _DEFAULT_DESTINATIONS.get(destination_chain)
             
     if not destination_address:
         raise ValueError(f"No destination address provided for {destination_chain} chain")
@@ -784,39 +1891,89 @@ def withdraw_cross_chain(account, token: str, amount: float, destination_chain:
     # Remove 'nep141:' prefix to get the token ID
     token_id = defuse_asset_id.replace('nep141:', '')
     
-    logger.info(f"\nWithdrawal Details:")
-    logger.info(f"Token: {token}")
-    logger.info(f"Chain: {destination_chain}")
-    logger.info(f"Token ID: {token_id}")
-    logger.info(f"Destination: {destination_address}")
+    logger.info("\nWithdrawal Details:")
+    logger.info("Token: %s", token)
+    logger.info("Chain: %s", destination_chain)
+    logger.info("Token ID: %s", token_id)
+    logger.info("Destination: %s", destination_address)
     
     amount_base = config.to_decimals(amount, token)
     
-    quote = Quote(
-        signer_id=account.account_id,
-        nonce=base64.b64encode(random.getrandbits(256).to_bytes(32, byteorder='big')).decode('utf-8'),
-        verifying_contract="intents.near",
-        deadline=get_future_deadline(),
-        intents=[{
-            "intent": "ft_withdraw",
-            "token": token_id,
-            "receiver_id": token_id,
-            "amount": amount_base,
-            "memo": f"WITHDRAW_TO:{destination_address}"
-        }]
-    )
+    quote = _build_quote(account, [{
+        "intent": "ft_withdraw",
+        "token": token_id,
+        "receiver_id": token_id,
+        "amount": amount_base,
+        "memo": f"WITHDRAW_TO:{destination_address}"
+    }])
     
-    signed_quote = sign_quote(account, json.dumps(quote))
-    signed_intent = PublishIntent(signed_data=signed_quote)
+    signed_quote = sign_quote(account, _dumpb(quote))
+    signed_intent: PublishIntent = {"signed_data": signed_quote}
     return publish_intent(signed_intent)
 
 
+def _wnear_registered(account):
+    """
+    Check whether both the account and intents.near have storage on wrap.near,
+    remembering confirmed registrations
+    """
+    accounts = [
+        account_id for account_id in (account.account_id, "intents.near")
+        if ("wrap.near", account_id) not in _REGISTERED
+    ]
+    storage_balances = view_calls(account, [
+        ("wrap.near", "storage_balance_of", {"account_id": account_id}) for account_id in accounts
+    ])
+    for account_id, storage_balance in zip(accounts, storage_balances):
+        if not storage_balance or isinstance(storage_balance, Exception):
+            return False
+        _REGISTERED.add(("wrap.near", account_id))
+    return True
+
+
+def _wrap_and_deposit_near(account, amount):
+    """
+    Wrap NEAR and transfer it into intents.near in a single transaction
+    Both actions run in order within one receipt, so the transfer sees the
+    freshly minted wNEAR without waiting on a separate wrap transaction.
+    Only a failure of the ft_transfer_call action itself rolls the wrap back,
+    if intents.near's ft_on_transfer fails (a separate receipt) ft_resolve_transfer
+    refunds the wNEAR and the account keeps it wrapped
+    """
+    amount_base = config.to_decimals(amount, "NEAR")
+    if not amount_base:
+        raise ValueError("Invalid amount for NEAR")
+    amount_base = int(amount_base)
+
+    # The wrapped NEAR comes from the native balance, check it like intent_deposit checks wNEAR
+    available = int(account.provider.get_account(account.account_id)['amount'])
+    if available < amount_base:
+        logger.error("Insufficient NEAR balance: have %s, need %s", from_decimals(available, "NEAR"), amount)
+        raise ValueError(f"Insufficient NEAR balance: have {from_decimals(available, 'NEAR')}, need {amount}")
+
+    actions = [
+        near_api.transactions.create_function_call_action('near_deposit', b'{}', WRAP_GAS, amount_base),
+        near_api.transactions.create_function_call_action('ft_transfer_call', _dumpb({
+            "receiver_id": "intents.near",
+            "amount": str(amount_base),
+            "msg": ""
+        }), MAX_GAS - WRAP_GAS, 1),
+    ]
+    logger.info("Wrapping and depositing %s NEAR in one transaction", amount)
+    result = submit_actions(account, 'wrap.near', actions)
+    invalidate_balances(account)
+    return result
+
+
 def deposit_token(account, token: str, amount: float, source_chain: str = None) -> dict:
     """Deposit any supported token into intents contract"""
     if token == "NEAR":
-        # Existing NEAR flow
-        wrap_result = wrap_near(account, amount)
-        time.sleep(3)
+        if _wnear_registered(account):
+            return _wrap_and_deposit_near(account, amount)
+        # near_deposit registers storage itself and keeps its cost out of the
+        # minted wNEAR, so the full amount can't be transferred in the same tx
+        # function_call waits for the wrap to execute, so the wNEAR is there already
+        wrap_near(account, amount)
         return intent_deposit(account, token, amount)
     else:
         # New flow for other tokens
@@ -831,13 +1988,34 @@ def deposit_token(account, token: str, amount: float, source_chain: str = None)
         return intent_deposit(account, token, amount)
 
 
-def create_account():
-    """Create a NEAR account using environment variables"""
-    account_id = os.getenv('NEAR_ACCOUNT_ID')
-    private_key = os.getenv('NEAR_PRIVATE_KEY')
-    provider = near_api.providers.JsonProvider(os.getenv('NEAR_RPC_URL', 'https://rpc.mainnet.near.org'))
+@functools.lru_cache(maxsize=8)
+def _get_provider(rpc_url):
+    """Get a shared JsonProvider for an RPC URL"""
+    return near_api.providers.JsonProvider(rpc_url)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_signer(account_id, private_key):
+    """Get a shared Signer, parsing the key pair only once per account"""
     key_pair = near_api.signer.KeyPair(private_key)
     signer = near_api.signer.Signer(account_id, key_pair)
+    _public_key_str(signer)
+    return signer
+
+
+def create_account(account_id=None, private_key=None, rpc_url=None):
+    """
+    Create a NEAR account, defaulting to the credentials from the environment
+    The provider and signer are shared, but every Account is new so it starts
+    from the access key's current on-chain nonce
+    Args:
+        account_id: NEAR account ID, defaults to NEAR_ACCOUNT_ID
+        private_key: ed25519 private key, defaults to NEAR_PRIVATE_KEY
+        rpc_url: RPC endpoint, defaults to NEAR_RPC_URL
+    """
+    account_id = account_id or NEAR_ACCOUNT_ID
+    provider = _get_provider(rpc_url or NEAR_RPC_URL)
+    signer = _get_signer(account_id, private_key or NEAR_PRIVATE_KEY)
     return near_api.account.Account(provider, signer, account_id)
 
 
@@ -856,18 +2034,17 @@ def setup_account(account=None):
         
     try:
         # Register public key
+        # register_intent_public_key polls until a new key is visible, no extra wait needed
         key_status = register_intent_public_key(account)
-        logger.info(f"Key registration status: {key_status}")
-        if key_status == "Key registered":
-            time.sleep(2)  # Wait for registration
+        logger.info("Key registration status: %s", key_status)
             
         # Register storage
         storage_status = register_intents_storage(account)
-        logger.info(f"Storage registration status: {storage_status}")
+        logger.info("Storage registration status: %s", storage_status)
         
         return account
     except Exception as e:
-        logger.error(f"Failed to setup account: {str(e)}")
+        logger.error("Failed to setup account: %s", e)
         raise e
 
 if __name__ == "__main__":
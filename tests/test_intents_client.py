@@ -8,8 +8,11 @@ from near_api.signer import KeyPair, Signer
 from near_api.providers import JsonProvider
 from decimal import Decimal
 import time
+import threading
+import asyncio
 import random
 import base64
+import hashlib
 import json
 import base58
 import logging
@@ -23,6 +26,7 @@ from clients.near_Intents_client.intents_client import (
     get_intent_balance,
     wrap_near,
     publish_intent,
+    select_best_option,
     Quote,
     Intent,
     PublishIntent,
@@ -35,6 +39,7 @@ from clients.near_Intents_client.intents_client import (
     setup_account
 )
 from clients.near_Intents_client import config  # Import the config module
+from clients.near_Intents_client import intents_client
 from clients.near_Intents_client.config import (
     get_token_by_symbol,
     get_defuse_asset_id,
@@ -70,6 +75,411 @@ def initialized_account():
     except Exception as e:
         pytest.fail(f"Failed to setup account: {str(e)}")
 
+def test_select_best_option_compares_amounts_numerically():
+    """Quote amounts are strings, the longer number must win over a lexically larger one"""
+    options = [
+        {"quote_hash": "a", "amount_out": "900000000"},
+        {"quote_hash": "b", "amount_out": "1000000000"},
+    ]
+    assert select_best_option(options)["quote_hash"] == "b"
+    assert select_best_option([]) is None
+
+def test_select_best_option_skips_malformed_amounts():
+    """Quotes without a numeric amount_out are ignored instead of raising"""
+    options = [
+        {"quote_hash": "a", "amount_out": "12"},
+        {"quote_hash": "b", "amount_out": "not-a-number"},
+        {"quote_hash": "c"},
+        {"quote_hash": "d", "amount_out": "²"},
+        {"quote_hash": "e", "amount_out": "١٢٣"},
+        {"quote_hash": "f", "amount_out": ""},
+    ]
+    assert select_best_option(options)["quote_hash"] == "a"
+    assert select_best_option(options[1:]) is None
+
+def _run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+def test_fetch_options_coalesced_single_caller_skips_window(monkeypatch):
+    """A lone caller goes straight to fetch_options without waiting out the batch window"""
+    monkeypatch.setattr(intents_client, "QUOTE_BATCH_WINDOW", 1.0)
+    monkeypatch.setattr(intents_client, "fetch_options", lambda request: [request])
+    started = time.monotonic()
+    assert intents_client.fetch_options_coalesced("a") == ["a"]
+    assert time.monotonic() - started < 0.5
+
+def test_fetch_options_coalesced_batches_concurrent_callers(monkeypatch):
+    """Callers arriving while a quote is in flight share one batch and each get their own quotes"""
+    first_in_flight = threading.Event()
+    release_first = threading.Event()
+    batches = []
+
+    def slow_fetch(request):
+        first_in_flight.set()
+        release_first.wait(5)
+        return [request]
+
+    def fetch_many(requests_):
+        batches.append(list(requests_))
+        return [[f"quote-{request}"] for request in requests_]
+
+    monkeypatch.setattr(intents_client, "QUOTE_BATCH_WINDOW", 0.2)
+    monkeypatch.setattr(intents_client, "fetch_options", slow_fetch)
+    monkeypatch.setattr(intents_client, "fetch_options_many", fetch_many)
+    results = {}
+
+    def call(request):
+        return lambda: results.__setitem__(request, intents_client.fetch_options_coalesced(request))
+
+    first = threading.Thread(target=call(0))
+    first.start()
+    assert first_in_flight.wait(5)
+    _run_threads([call(i) for i in range(1, 6)])
+    release_first.set()
+    first.join(timeout=5)
+
+    assert results == {0: [0], **{i: [f"quote-{i}"] for i in range(1, 6)}}
+    assert len(batches) == 1 and sorted(batches[0]) == [1, 2, 3, 4, 5]
+
+def test_fetch_options_coalesced_propagates_batch_errors(monkeypatch):
+    """Every caller of a failed batch gets the error instead of waiting forever"""
+    def fail(requests_):
+        raise ValueError("bus down")
+
+    monkeypatch.setattr(intents_client, "QUOTE_BATCH_WINDOW", 0.2)
+    monkeypatch.setattr(intents_client, "_quotes_in_flight", 1)  # Pretend another quote is in flight
+    monkeypatch.setattr(intents_client, "fetch_options_many", fail)
+    monkeypatch.setattr(intents_client, "fetch_options", lambda request: fail([request]))
+    errors = []
+
+    def call():
+        try:
+            intents_client.fetch_options_coalesced("x")
+        except ValueError as e:
+            errors.append(e)
+
+    _run_threads([call, call, call])
+    assert len(errors) == 3
+    assert intents_client._quote_queue == []
+
+def _borsh_quote(intents):
+    return {
+        "nonce": "bm9uY2U=",
+        "signer_id": "alice.near",
+        "verifying_contract": "intents.near",
+        "deadline": "2030-01-01T00:00:00.000Z",
+        "intents": intents
+    }
+
+@pytest.mark.parametrize("intents", [
+    [],
+    [{"intent": "token_diff", "diff": {"nep141:wrap.near": "-1", "nep141:usdc.near": "5"}}],
+    # Unsorted, non-ASCII and prefix-sharing keys
+    [{"intent": "token_diff", "diff": {"nep141:ü.near": "7", "nep141:z.near": "-7"}}],
+    [{"intent": "token_diff", "diff": {"nep141:ab": "1", "nep141:a": "-1"}}],
+    [
+        {"intent": "token_diff", "diff": {"b": "-340282366920938463463374607431768211455", "a": "340282366920938463463374607431768211455"}},
+        {"intent": "token_diff", "diff": {"x": "0", "w": "-0"}},
+    ],
+    # Diffs that aren't two entries take the schema path
+    [
+        {"intent": "token_diff", "diff": {"b": "-1", "a": "1"}},
+        {"intent": "token_diff", "diff": {"only": "1"}},
+        {"intent": "token_diff", "diff": {"c": "1", "b": "2", "a": "-3"}},
+    ],
+])
+def test_quote_to_borsh_matches_schema(intents):
+    """The two-entry diff fast path must produce the exact bytes of the generic schema"""
+    quote = _borsh_quote(intents)
+    assert intents_client.quote_to_borsh(quote) == intents_client._QUOTE_SCHEMA.build(quote)
+
+class _FakeTxProvider:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+
+    def get_tx(self, tx_hash, account_id):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+def _fake_tx_account(outcomes):
+    class FakeAccount:
+        account_id = "alice.near"
+        provider = _FakeTxProvider(outcomes)
+    return FakeAccount()
+
+def test_wait_for_tx_retries_unknown_transaction():
+    """A tx the node hasn't seen yet is polled again until it executes"""
+    from near_api.providers import JsonProviderError
+    unknown = JsonProviderError({"name": "HANDLER_ERROR", "cause": {"name": "UNKNOWN_TRANSACTION"}})
+    account = _fake_tx_account([unknown, unknown, {"status": {"SuccessValue": ""}}])
+    assert intents_client.wait_for_tx(account, "hash", delays=(0, 0, 0, 0))
+
+def test_wait_for_tx_raises_hard_errors():
+    """Hard RPC errors surface at once instead of spinning out the poll budget"""
+    from near_api.providers import JsonProviderError
+    bad_hash = JsonProviderError({"name": "REQUEST_VALIDATION_ERROR", "cause": {"name": "PARSE_ERROR"}})
+    account = _fake_tx_account([bad_hash, {"status": {"SuccessValue": ""}}])
+    with pytest.raises(JsonProviderError):
+        intents_client.wait_for_tx(account, "hash", delays=(0, 0))
+    assert len(account.provider.outcomes) == 1
+
+class _FakeActionProvider:
+    block_hash = bytes(range(32))
+
+    def __init__(self, balance=10 ** 25, status=None):
+        self.balance = balance
+        self.status = status or {"SuccessValue": ""}
+        self.sent = []
+
+    def get_status(self):
+        return {"sync_info": {"latest_block_hash": base58.b58encode(self.block_hash).decode()}}
+
+    def get_account(self, account_id):
+        return {"amount": str(self.balance)}
+
+    def send_tx_and_wait(self, signed_tx, timeout):
+        self.sent.append(signed_tx)
+        return {"status": self.status}
+
+def _action_account(provider):
+    account = _signing_account()
+    account.provider = provider
+    account.access_key = {"nonce": 5}
+    return account
+
+def test_submit_actions_signs_with_next_nonce():
+    """Each multi-action transaction is signed with the next access key nonce and the latest block hash"""
+    from near_api import transactions
+    account = _action_account(_FakeActionProvider())
+    actions = [transactions.create_transfer_action(1), transactions.create_transfer_action(2)]
+    intents_client.submit_actions(account, "wrap.near", actions)
+    intents_client.submit_actions(account, "wrap.near", actions)
+    assert account.access_key["nonce"] == 7
+    assert account.provider.sent == [
+        transactions.sign_and_serialize_transaction("wrap.near", nonce, actions, _FakeActionProvider.block_hash, account.signer)
+        for nonce in (6, 7)
+    ]
+
+def test_submit_actions_raises_on_failure():
+    account = _action_account(_FakeActionProvider(status={"Failure": {"ActionError": {}}}))
+    with pytest.raises(intents_client.near_api.account.TransactionError):
+        intents_client.submit_actions(account, "wrap.near", [])
+
+def test_wrap_and_deposit_sends_one_transaction(monkeypatch):
+    """near_deposit and ft_transfer_call go out together, and a short native balance sends nothing"""
+    monkeypatch.setattr(intents_client, "_BALANCE_CACHE", {})
+    account = _action_account(_FakeActionProvider())
+    intents_client._wrap_and_deposit_near(account, 1)
+    assert account.access_key["nonce"] == 6 and len(account.provider.sent) == 1
+    assert b"near_deposit" in account.provider.sent[0] and b"ft_transfer_call" in account.provider.sent[0]
+
+    poor = _action_account(_FakeActionProvider(balance=10 ** 23))
+    with pytest.raises(ValueError):
+        intents_client._wrap_and_deposit_near(poor, 1)
+    assert poor.provider.sent == [] and poor.access_key["nonce"] == 5
+
+class _FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode()
+        self.text = self.content.decode()
+
+class _FakeSolverSession:
+    """Answers quote batches with one quote per call, quote_hash = exact_amount_in"""
+    def __init__(self, respond=None):
+        self.posts = []
+        self.respond = respond
+
+    def post(self, url, data=None, timeout=None):
+        body = json.loads(data)
+        self.posts.append(body)
+        if self.respond:
+            return self.respond(body)
+        calls = body if isinstance(body, list) else [body]
+        results = [
+            {"jsonrpc": "2.0", "id": call["id"], "result": [{"quote_hash": call["params"][0]["exact_amount_in"]}]}
+            for call in calls
+        ]
+        return _FakeResponse(results if isinstance(body, list) else results[0])
+
+def _quote_request(amount):
+    return intents_client.IntentRequest().asset_in("USDC", amount).asset_out("NEAR", chain="near")
+
+@pytest.fixture
+def solver_bus(monkeypatch):
+    monkeypatch.setattr(intents_client, "_QUOTE_CACHE", {})
+    monkeypatch.setattr(intents_client, "SOLVER_BUS_BATCHING", True)
+    session = _FakeSolverSession()
+    monkeypatch.setattr(intents_client, "SESSION", session)
+    return session
+
+def test_solver_rpc_batch_matches_responses_by_id(solver_bus):
+    """Out-of-order batch answers are put back in call order, unanswered calls get an error entry"""
+    solver_bus.respond = lambda body: _FakeResponse([
+        {"jsonrpc": "2.0", "id": 2, "result": "c"},
+        {"jsonrpc": "2.0", "id": 0, "result": "a"},
+        {"jsonrpc": "2.0", "id": 7, "result": "stray"},
+    ])
+    results = intents_client.solver_rpc_batch([{"method": "quote", "params": [i]} for i in range(3)])
+    assert [result.get("result") for result in results] == ["a", None, "c"]
+    assert "error" in results[1]
+    assert len(solver_bus.posts) == 1 and [call["id"] for call in solver_bus.posts[0]] == [0, 1, 2]
+
+def test_fetch_options_many_chunks_and_demultiplexes(solver_bus, monkeypatch):
+    """Requests are sent MAX_BATCH at a time and every request gets its own quotes back"""
+    monkeypatch.setattr(intents_client, "MAX_BATCH", 2)
+    requests_ = [_quote_request(amount) for amount in (1, 2, 3, 4, 5)]
+    options = intents_client.fetch_options_many(requests_)
+    assert [len(body) for body in solver_bus.posts] == [2, 2, 1]
+    assert [quotes[0]["quote_hash"] for quotes in options] == [str(amount * 10 ** 6) for amount in (1, 2, 3, 4, 5)]
+
+def test_fetch_options_many_error_entries_and_invalid_requests(solver_bus):
+    """RPC error entries and unquotable requests yield empty option lists"""
+    solver_bus.respond = lambda body: _FakeResponse([
+        {"jsonrpc": "2.0", "id": 0, "error": {"message": "no liquidity"}},
+        {"jsonrpc": "2.0", "id": 1, "result": [{"quote_hash": "ok"}]},
+    ])
+    unsupported = intents_client.IntentRequest().asset_in("BTC", 1).asset_out("NEAR", chain="near")
+    options = intents_client.fetch_options_many([_quote_request(1), unsupported, _quote_request(2)])
+    assert options == [[], [], [{"quote_hash": "ok"}]]
+    assert len(solver_bus.posts[0]) == 2
+
+def test_fetch_options_many_falls_back_to_single_calls(solver_bus):
+    """A rejected batch is retried as one quote call per request"""
+    def respond(body):
+        if isinstance(body, list):
+            return _FakeResponse({"error": "batches not supported"}, status_code=400)
+        return _FakeResponse({"jsonrpc": "2.0", "id": 1, "result": [{"quote_hash": body["params"][0]["exact_amount_in"]}]})
+
+    solver_bus.respond = respond
+    options = intents_client.fetch_options_many([_quote_request(1), _quote_request(2)])
+    assert [quotes[0]["quote_hash"] for quotes in options] == ["1000000", "2000000"]
+    assert sum(isinstance(body, dict) for body in solver_bus.posts) == 2
+
+class _FakeAsyncResponse:
+    def __init__(self, response):
+        self.status = response.status_code
+        self._response = response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def read(self):
+        return self._response.content
+
+    async def text(self):
+        return self._response.text
+
+class _FakeAsyncSolverSession:
+    """aiohttp-shaped wrapper around _FakeSolverSession"""
+    def __init__(self, session):
+        self.session = session
+
+    def post(self, url, json=None):
+        return _FakeAsyncResponse(self.session.post(url, data=intents_client._dumpb(json)))
+
+def test_afetch_options_shares_filter_and_cache(solver_bus):
+    """The async path rejects unquotable requests and shares the quote cache with fetch_options"""
+    session = _FakeAsyncSolverSession(solver_bus)
+    unsupported = intents_client.IntentRequest().asset_in("BTC", 1).asset_out("NEAR", chain="near")
+    assert asyncio.run(intents_client.afetch_options(session, unsupported)) == []
+    assert solver_bus.posts == []
+
+    quotes = asyncio.run(intents_client.afetch_options(session, _quote_request(1)))
+    assert quotes == [{"quote_hash": "1000000"}]
+    assert intents_client.fetch_options(_quote_request(1)) == quotes
+    assert len(solver_bus.posts) == 1
+
+def test_cached_quotes_are_handed_out_once(solver_bus):
+    """A cached quote_hash goes to one caller only, the next caller fetches its own quote"""
+    first = intents_client.fetch_options(_quote_request(1))
+    solver_bus.respond = lambda body: _FakeResponse({"jsonrpc": "2.0", "id": 1, "result": [{"quote_hash": "fresh"}]})
+    assert intents_client.fetch_options(_quote_request(1)) == first
+    assert intents_client.fetch_options(_quote_request(1)) == [{"quote_hash": "fresh"}]
+    assert len(solver_bus.posts) == 2
+
+def test_store_quotes_drops_expired_entries(monkeypatch):
+    """Storing a quote evicts answers older than QUOTE_TTL"""
+    monkeypatch.setattr(intents_client, "_QUOTE_CACHE", {("USDC", "NEAR", "1"): (time.monotonic() - 1, [{"quote_hash": "old"}])})
+    params = intents_client._quote_params(_quote_request(2))
+    intents_client._store_quotes(params, [{"quote_hash": "new"}])
+    assert list(intents_client._QUOTE_CACHE) == [tuple(params.values())]
+
+def test_apublish_intent_forgets_quotes_and_balances(solver_bus, monkeypatch):
+    """Publishing through the async path drops the spent quotes and cached balances like publish_intent"""
+    monkeypatch.setattr(intents_client, "_BALANCE_CACHE", {("alice.near", "nep141:wrap.near"): (time.monotonic(), 1)})
+    session = _FakeAsyncSolverSession(solver_bus)
+    quotes = asyncio.run(intents_client.afetch_options(session, _quote_request(1)))
+    assert intents_client._QUOTE_CACHE
+
+    solver_bus.respond = lambda body: _FakeResponse({"jsonrpc": "2.0", "id": "dontcare", "result": {"status": "OK"}})
+    signed_intent = {"quote_hashes": [quotes[0]["quote_hash"]]}
+    result = asyncio.run(intents_client.apublish_intent(session, signed_intent))
+    assert result["result"]["status"] == "OK"
+    assert intents_client._QUOTE_CACHE == {}
+    assert intents_client._BALANCE_CACHE == {}
+
+def _signing_account():
+    import ed25519
+    signing_key, _ = ed25519.create_keypair()
+    key_pair = KeyPair(base58.b58encode(signing_key.to_bytes()).decode())
+
+    class SigningAccount:
+        account_id = "alice.near"
+        signer = Signer("alice.near", key_pair)
+    return SigningAccount()
+
+def test_merkle_proof_single_leaf_is_root():
+    """A one-leaf tree has the leaf as root and an empty proof"""
+    leaf = b"\x01" * 32
+    levels = intents_client._merkle_levels([leaf])
+    assert levels[-1] == [leaf]
+    assert intents_client._merkle_proof(levels, 0) == []
+    assert intents_client._merkle_root_from_proof(leaf, []) == leaf
+
+@pytest.mark.parametrize("count", [2, 3, 5])
+def test_merkle_batch_signing_round_trips(monkeypatch, count):
+    """Every Merkle commitment verifies, including duplicated odd-level nodes, and a tampered leaf fails"""
+    monkeypatch.setattr(intents_client, "MERKLE_BATCH_SIGNING", True)
+    quotes = [json.dumps({"nonce": str(i), "deadline": "2030"}) for i in range(count)]
+    commitments = intents_client.sign_quote_batch(_signing_account(), quotes, workers=1)
+    assert all(commitment["standard"] == "merkle_ed25519" for commitment in commitments)
+    assert intents_client.verify_quotes_batch(commitments, workers=1) == [True] * count
+
+    tampered = [dict(commitment) for commitment in commitments]
+    tampered[-1]["payload"] = quotes[0]
+    assert intents_client.verify_quotes_batch(tampered, workers=1) == [True] * (count - 1) + [False]
+
+def test_merkle_leaf_cannot_pose_as_node():
+    """Leaves and internal nodes are hashed under different prefixes"""
+    left, right = intents_client._merkle_leaf(b"a"), intents_client._merkle_leaf(b"b")
+    root = intents_client._merkle_levels([left, right])[-1][0]
+    assert intents_client._merkle_leaf(left + right) != root
+    assert root == hashlib.sha256(b"\x01" + left + right).digest()
+
+def test_raw_signing_round_trips():
+    """Single raw_ed25519 commitments verify, and fail once the payload changes"""
+    commitment = intents_client.sign_quote(_signing_account(), '{"nonce":"0"}')
+    assert intents_client.verify_quotes_batch([commitment]) == [True]
+    assert intents_client.verify_quotes_batch([{**commitment, "payload": '{"nonce":"1"}'}]) == [False]
+
+    # Malformed entries are marked False without aborting the rest of the batch
+    malformed = [
+        {**commitment, "payload": {"nonce": "0"}},
+        {**commitment, "public_key": None},
+        {key: value for key, value in commitment.items() if key != "signature"},
+    ]
+    assert intents_client.verify_quotes_batch(malformed + [commitment], workers=2) == [False, False, False, True]
+
 def test_near_deposit_and_withdraw(initialized_account):
     account = initialized_account
     """Test depositing and withdrawing NEAR"""